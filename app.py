@@ -4,17 +4,49 @@ Vehicle Detection Dashboard
 Real-time vehicle detection using YOLOv8 with Streamlit dashboard.
 Supports: Local video files (MP4) and RTSP streams from CCTV cameras.
 
-Compatible: Python 3.9+, Windows 10/11, CPU-only
+Compatible: Python 3.9+, Windows 10/11, CPU-only (uses CUDA FP16 when available)
 """
 
+import functools
 import os
+import queue
+import re
+import shutil
+import subprocess
 import streamlit as st
 import cv2
 import numpy as np
 import tempfile
+import threading
 import time
 import plotly.graph_objects as go
+from collections import deque
 from datetime import datetime
+from typing import NamedTuple
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Optional orjson: Plotly then serializes figures (and their numpy arrays)
+# with it on every st.plotly_chart call instead of the stdlib json encoder
+try:
+    import orjson  # noqa: F401
+    import plotly.io as pio
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    pass
+
+# Split the cores between OpenCV and ONNX Runtime so the decode/draw threads
+# and inference don't oversubscribe the CPU; resize/encode go to OpenCL
+# (T-API) when a device exists and transparently stay on the CPU otherwise
+CV2_NUM_THREADS = max(1, (os.cpu_count() or 2) // 2)
+ORT_NUM_THREADS = max(1, (os.cpu_count() or 2) - CV2_NUM_THREADS)
+cv2.setNumThreads(CV2_NUM_THREADS)
+cv2.ocl.setUseOpenCL(True)
+OPENCL_AVAILABLE = cv2.ocl.useOpenCL()
 
 # ============================================================================
 # CONFIGURATION CONSTANTS
@@ -34,8 +66,56 @@ VEHICLE_COLORS = {
     "truck": (128, 0, 128)
 }
 
+VEHICLE_CLASS_IDS = np.array(list(VEHICLE_CLASSES), dtype=np.int64)
+
+# Lookup tables indexed directly by COCO class id (detections carry the raw id)
+CLASS_NAMES = np.full(80, "", dtype=object)
+CLASS_COLORS_BGR = np.full((80, 3), 255, dtype=np.uint8)
+for _class_id, _class_name in VEHICLE_CLASSES.items():
+    CLASS_NAMES[_class_id] = _class_name
+    CLASS_COLORS_BGR[_class_id] = VEHICLE_COLORS[_class_name]
+
 CHART_COLORS = ["#10b981", "#f59e0b", "#3b82f6", "#8b5cf6"]
 
+# Charts refreshed inside the detection loop are static (no hover/zoom state to sync)
+CHART_CONFIG = {'displayModeBar': False}
+LIVE_CHART_CONFIG = {'displayModeBar': False, 'staticPlot': True}
+
+# Processed frames between live chart refreshes. Each refresh ships a whole new
+# Plotly element (keys must stay unique within a run), so live streams refresh
+# less often; both charts are skipped when the counts have not changed.
+CHART_REFRESH_EVERY = 5
+CHART_REFRESH_EVERY_RTSP = 15
+
+# Model files (ONNX export is generated from the .pt on first load, the
+# INT8 ONNX model by quantize_model.py and the INT8 TensorRT engine by
+# export_engine.py, both offline)
+MODEL_PATH = "yolov8n.pt"
+ONNX_MODEL_PATH = "yolov8n.onnx"
+INT8_MODEL_PATH = "yolov8n-int8.onnx"
+MODEL_INPUT_SIZE = 640
+NMS_IOU_THRESHOLD = 0.45
+
+# Ultralytics predict arguments: restricting to vehicle classes makes the
+# model drop the other 76 classes before NMS instead of after
+YOLO_PREDICT_ARGS = dict(
+    classes=list(VEHICLE_CLASSES),
+    iou=NMS_IOU_THRESHOLD,
+    imgsz=MODEL_INPUT_SIZE,
+    verbose=False,
+)
+
+# Live stream UI refresh cap (uploaded files are processed as fast as possible)
+LIVE_TARGET_FPS = 15
+
+# Frames per model call when processing uploaded files on GPU/PyTorch
+# (live streams stay at one frame per call to keep latency low)
+BATCH_SIZE = 4
+
+# Video feed display (the column never shows more than ~1280px)
+DISPLAY_MAX_WIDTH = 1280
+DISPLAY_JPEG_QUALITY = 75
+
 # ============================================================================
 # STREAMLIT PAGE CONFIG
 # ============================================================================
@@ -274,12 +354,147 @@ st.markdown("""
 # MODEL LOADING
 # ============================================================================
 
+class OnnxVehicleDetector:
+    """YOLOv8 exported to ONNX, executed with ONNX Runtime on CPU."""
+
+    def __init__(self, model_path: str):
+        import onnxruntime as ort
+
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = ORT_NUM_THREADS
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, sess_options=so, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        
+        out_meta = self.session.get_outputs()[0]
+        self.output_name = out_meta.name
+        out_shape = [d if isinstance(d, int) else 1 for d in out_meta.shape]
+        if len(out_shape) != 3 or out_shape[2] == 1:
+            out_shape = [1, 84, 3 * sum((MODEL_INPUT_SIZE // s) ** 2 for s in (8, 16, 32))]
+        self.output_shape = out_shape
+        # The detector is shared by every session (st.cache_resource), so the
+        # bound buffers are per thread: concurrent runs never share input/output
+        self._local = threading.local()
+    
+    def _io(self):
+        """
+        This thread's IO binding: ORT reads the input from, and writes the
+        output into, these NumPy buffers directly instead of copying them on
+        every run.
+        """
+        io = self._local
+        if not hasattr(io, "binding"):
+            import onnxruntime as ort
+            io.blob = np.empty((1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), dtype=np.float32)
+            io.output = np.empty(self.output_shape, dtype=np.float32)
+            io.binding = self.session.io_binding()
+            io.binding.bind_ortvalue_input(self.input_name, ort.OrtValue.ortvalue_from_numpy(io.blob))
+            io.binding.bind_ortvalue_output(self.output_name, ort.OrtValue.ortvalue_from_numpy(io.output))
+        return io
+    
+    @property
+    def blob(self):
+        """The calling thread's (1, 3, S, S) float32 input buffer."""
+        return self._io().blob
+    
+    def run(self):
+        """
+        Run the model on this thread's blob; returns the (84, N) raw output
+        view, valid until this thread's next run().
+        """
+        io = self._io()
+        self.session.run_with_iobinding(io.binding)
+        return io.output[0]
+
+
+def _cuda_available() -> bool:
+    """True when PyTorch is installed and sees a CUDA device."""
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def _tensorrt_engine_path(int8: bool = False) -> str:
+    """Engine file name for this host's GPU (TensorRT engines are GPU-arch specific)."""
+    import torch
+    gpu = re.sub(r"[^A-Za-z0-9]+", "_", torch.cuda.get_device_name(0)).strip("_").lower()
+    # The FP16 engine is exported here with a dynamic batch up to BATCH_SIZE;
+    # the INT8 one comes from export_engine.py (dynamic, batch 8)
+    variant = "-int8" if int8 else f"-b{BATCH_SIZE}"
+    return f"{os.path.splitext(MODEL_PATH)[0]}{variant}-{gpu}.engine"
+
+
 @st.cache_resource
 def load_yolo_model():
-    """Load YOLOv8 nano model."""
+    """
+    Load the model once per server process and warm it up with a dummy frame,
+    so TensorRT/cuDNN autotuning, ORT graph setup and the Numba JIT happen
+    here instead of on the first real frame.
+    """
+    model = _load_yolo_model()
+    if model is not None:
+        try:
+            run_vehicle_detection(model, np.zeros((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, 3), dtype=np.uint8), 0.5)
+        except Exception as e:
+            st.warning(f"Model warmup failed: {str(e)}")
+    return model
+
+def _load_yolo_model():
+    """
+    Load YOLOv8 nano model. On CUDA hosts: a TensorRT INT8 engine if one was
+    exported offline, else a TensorRT FP16 engine (exported once and cached
+    per GPU), else FP16 PyTorch. On CPU hosts: ONNX Runtime, else the
+    Ultralytics CPU model.
+    """
+    if _cuda_available():
+        try:
+            from ultralytics import YOLO
+            engine_path = _tensorrt_engine_path(int8=True)
+            if os.path.exists(engine_path):
+                model = YOLO(engine_path, task="detect")
+                model.overrides.update(device=0)
+                return model
+            engine_path = _tensorrt_engine_path()
+            if not os.path.exists(engine_path):
+                exported = YOLO(MODEL_PATH).export(
+                    format="engine", half=True, imgsz=MODEL_INPUT_SIZE, workspace=4,
+                    dynamic=True, batch=BATCH_SIZE,
+                )
+                os.replace(exported, engine_path)
+            model = YOLO(engine_path, task="detect")
+            model.overrides.update(device=0, half=True)
+            return model
+        except Exception as e:
+            st.warning(f"TensorRT export failed, using PyTorch FP16: {str(e)}")
+        
+        try:
+            from ultralytics import YOLO
+            model = YOLO(MODEL_PATH)
+            model.to("cuda")
+            model.model.half()
+            model.overrides.update(device=0, half=True)
+            return model
+        except Exception as e:
+            st.warning(f"CUDA model load failed, falling back to CPU: {str(e)}")
+    
+    try:
+        if os.path.exists(INT8_MODEL_PATH):
+            return OnnxVehicleDetector(INT8_MODEL_PATH)
+        onnx_path = ONNX_MODEL_PATH
+        if not os.path.exists(onnx_path):
+            from ultralytics import YOLO
+            onnx_path = YOLO(MODEL_PATH).export(format="onnx", imgsz=MODEL_INPUT_SIZE)
+        return OnnxVehicleDetector(onnx_path)
+    except Exception as e:
+        st.warning(f"ONNX Runtime unavailable, falling back to PyTorch: {str(e)}")
+    
     try:
         from ultralytics import YOLO
-        model = YOLO("yolov8n.pt")
+        model = YOLO(MODEL_PATH)
         return model
     except Exception as e:
         st.error(f"Failed to load model: {str(e)}")
@@ -289,20 +504,37 @@ def load_yolo_model():
 # RTSP CONNECTION HELPERS
 # ============================================================================
 
-def create_rtsp_capture(rtsp_url: str, transport: str = "tcp"):
-    """
-    Create optimized VideoCapture for RTSP streams.
-    Tries TCP first then UDP for maximum compatibility with ONVIF cameras.
-    """
-    os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = (
+# FFmpeg demuxer options per RTSP transport. OpenCV only reads these from the
+# environment, so they are built once and the variable is only rewritten (under
+# a lock, while opening) when the transport actually changes.
+FFMPEG_RTSP_OPTIONS = {
+    transport: (
         f"rtsp_transport;{transport}"
         "|analyzeduration;2000000"
         "|probesize;1000000"
         "|fflags;nobuffer"
-        "|stimeout;15000000"
     )
-    
-    cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
+    for transport in ("tcp", "udp")
+}
+os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = FFMPEG_RTSP_OPTIONS["tcp"]
+_ffmpeg_options_lock = threading.Lock()
+
+# Timeouts go through the explicit VideoCapture params API instead of stimeout
+RTSP_CAPTURE_PARAMS = [
+    cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 15000,
+    cv2.CAP_PROP_READ_TIMEOUT_MSEC, 15000,
+]
+
+def create_rtsp_capture(rtsp_url: str, transport: str = "tcp"):
+    """
+    Create optimized VideoCapture for RTSP streams.
+    Tries TCP first then UDP for maximum compatibility with ONVIF cameras.
+    """
+    with _ffmpeg_options_lock:
+        options = FFMPEG_RTSP_OPTIONS[transport]
+        if os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS") != options:
+            os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = options
+        cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG, RTSP_CAPTURE_PARAMS)
     
     if cap.isOpened():
         cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
@@ -311,8 +543,149 @@ def create_rtsp_capture(rtsp_url: str, transport: str = "tcp"):
     return None
 
 
+# Hardware H.264 decoders tried in order (Windows: D3D11/QuickSync, Linux: NVDEC/Jetson/VA-API)
+GST_H264_DECODERS = (
+    ("d3d11h264dec", "qsvh264dec") if os.name == "nt"
+    else ("nvh264dec", "nvv4l2decoder", "vaapih264dec")
+)
+GSTREAMER_AVAILABLE = re.search(r"GStreamer:\s*YES", cv2.getBuildInformation()) is not None
+
+
+def create_rtsp_capture_gst(rtsp_url: str):
+    """
+    Create a GStreamer VideoCapture that decodes H.264 on the GPU/iGPU.
+    Returns None when OpenCV lacks GStreamer or no hardware decoder opens.
+    """
+    if not GSTREAMER_AVAILABLE:
+        return None
+    
+    # Quote the URL for gst_parse_launch: credentials or query strings may
+    # contain spaces, '!' or '=' that would otherwise split the pipeline
+    location = '"' + rtsp_url.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    for decoder in GST_H264_DECODERS:
+        pipeline = (
+            f"rtspsrc location={location} latency=100 ! rtph264depay ! h264parse ! "
+            f"{decoder} ! videoconvert ! video/x-raw,format=BGR ! "
+            "appsink drop=1 max-buffers=1 sync=false"
+        )
+        cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+        if cap.isOpened():
+            return cap
+        cap.release()
+    
+    return None
+
+
+FFMPEG_BIN = shutil.which("ffmpeg")
+FFPROBE_BIN = shutil.which("ffprobe")
+
+
+class FfmpegCuvidCapture:
+    """
+    RTSP reader that decodes H.264 on NVDEC (h264_cuvid) in an ffmpeg
+    subprocess and reads raw BGR frames from its stdout pipe. Implements the
+    part of the cv2.VideoCapture API used here (grab/retrieve/read/isOpened/release).
+    """
+
+    def __init__(self, rtsp_url: str, width: int, height: int, transport: str = "tcp"):
+        self.width = width
+        self.height = height
+        self.frame_bytes = width * height * 3
+        self._frame = None
+        self.proc = subprocess.Popen(
+            [
+                FFMPEG_BIN, "-loglevel", "error", "-nostdin",
+                "-rtsp_transport", transport, "-fflags", "nobuffer",
+                "-hwaccel", "cuda", "-c:v", "h264_cuvid", "-i", rtsp_url,
+                "-an", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=self.frame_bytes,
+        )
+
+    def isOpened(self) -> bool:
+        return self.proc.poll() is None
+
+    def grab(self) -> bool:
+        buf = bytearray(self.frame_bytes)
+        view = memoryview(buf)
+        filled = 0
+        while filled < self.frame_bytes:
+            n = self.proc.stdout.readinto(view[filled:])
+            if not n:
+                self._frame = None
+                return False
+            filled += n
+        self._frame = buf
+        return True
+
+    def retrieve(self):
+        if self._frame is None:
+            return False, None
+        return True, np.frombuffer(self._frame, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.stdout.close()
+        self.proc.wait()
+
+
+def create_rtsp_capture_cuvid(rtsp_url: str, transport: str = "tcp"):
+    """
+    Create an FfmpegCuvidCapture for the stream. Returns None without ffmpeg,
+    without a CUDA GPU, or when the stream's resolution cannot be probed.
+    """
+    if FFMPEG_BIN is None or FFPROBE_BIN is None or not _cuda_available():
+        return None
+    
+    try:
+        probe = subprocess.run(
+            [
+                FFPROBE_BIN, "-v", "error", "-rtsp_transport", transport,
+                "-select_streams", "v:0", "-show_entries", "stream=width,height",
+                "-of", "csv=p=0:s=x", rtsp_url,
+            ],
+            capture_output=True, text=True, timeout=15,
+        )
+        width, height = map(int, probe.stdout.strip().splitlines()[0].split("x"))
+    except (subprocess.SubprocessError, ValueError, IndexError):
+        return None
+    
+    cap = FfmpegCuvidCapture(rtsp_url, width, height, transport)
+    if cap.isOpened():
+        return cap
+    cap.release()
+    return None
+
+
+def create_rtsp_capture_hw(rtsp_url: str):
+    """
+    Hardware-decoded capture: ffmpeg NVDEC (TCP, then UDP), then GStreamer.
+    Returns None when neither is available.
+    """
+    for transport in ("tcp", "udp"):
+        cap = create_rtsp_capture_cuvid(rtsp_url, transport)
+        if cap is not None:
+            return cap
+    return create_rtsp_capture_gst(rtsp_url)
+
+
 def test_rtsp_connection(rtsp_url: str) -> tuple:
-    """Test RTSP connection with TCP then UDP fallback."""
+    """Test RTSP connection: NVDEC/GStreamer HW decode first, then FFmpeg TCP/UDP."""
+    cap = create_rtsp_capture_hw(rtsp_url)
+    if cap is not None:
+        ret, _ = cap.read()
+        cap.release()
+        if ret:
+            return True, "Connected (HW decode)"
+    
     for transport in ["tcp", "udp"]:
         try:
             cap = create_rtsp_capture(rtsp_url, transport)
@@ -328,52 +701,493 @@ def test_rtsp_connection(rtsp_url: str) -> tuple:
     
     return False, "Failed to connect - check URL, credentials, and VPN"
 
+
+def read_sampled(cap, stride: int = 1):
+    """
+    Advance the capture by `stride` frames but decode only the last one.
+    grab() demuxes without decoding, so skipped frames cost almost nothing.
+    """
+    for _ in range(stride):
+        if not cap.grab():
+            return False, None
+    return cap.retrieve()
+
+
+class ThreadedCapture:
+    """
+    Decode frames on a background thread, keeping only the newest one.
+    Stream decoding overlaps with inference instead of running serially,
+    and a single slot (no queue) keeps latency from building up.
+    """
+
+    def __init__(self, cap, stride: int = 1):
+        self.cap = cap
+        self.stride = stride
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._read_seq = 0
+        self._ok = True
+        self._running = True
+        self._thread = threading.Thread(target=self._update_loop, daemon=True)
+        self._thread.start()
+
+    def _update_loop(self):
+        try:
+            while self._running:
+                ok, frame = read_sampled(self.cap, self.stride)
+                with self._cond:
+                    if ok:
+                        self._frame = frame
+                        self._seq += 1
+                    else:
+                        self._ok = False
+                    self._cond.notify_all()
+                if not ok:
+                    break
+        finally:
+            # The capture is released by the thread that uses it: an RTSP grab()
+            # can block past release()'s join timeout, and freeing the capture
+            # under it would crash inside OpenCV
+            self.cap.release()
+
+    def read(self, timeout: float = 5.0):
+        """Return the newest unread frame, waiting up to `timeout` seconds."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != self._read_seq or not self._ok, timeout)
+            if self._seq == self._read_seq:
+                return False, None
+            self._read_seq = self._seq
+            return True, self._frame
+
+    def release(self):
+        """
+        Stop the decode thread; it releases the underlying capture on exit
+        (possibly after this returns, if a grab() is still blocked).
+        """
+        self._running = False
+        with self._cond:
+            self._ok = False
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+
+
+class PrefetchCapture:
+    """
+    Decode video file frames on a background thread into a small bounded
+    queue, so decoding overlaps with inference. Unlike ThreadedCapture no
+    frame is ever dropped (every sampled frame must be counted); the decoder
+    simply waits while the queue is full.
+    """
+
+    def __init__(self, cap, stride: int = 1, maxsize: int = 2):
+        self.cap = cap
+        self.stride = stride
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._running = True
+        self._thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self._thread.start()
+
+    def _decode_loop(self):
+        try:
+            while self._running:
+                item = read_sampled(self.cap, self.stride)
+                while self._running:
+                    try:
+                        self._queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if not item[0]:
+                    break
+        finally:
+            # Released here rather than in release(), for the same reason as
+            # ThreadedCapture: a slow grab() may outlive the join timeout
+            self.cap.release()
+
+    def read(self):
+        """Return the next sampled frame as (ok, frame)."""
+        return self._queue.get()
+
+    def release(self):
+        """Stop the decode thread; it releases the underlying capture on exit."""
+        self._running = False
+        self._thread.join(timeout=1.0)
+
+
+class InferenceWorker:
+    """
+    Run vehicle detection on a ThreadedCapture from its own thread.
+    Decode, inference and draw/render then overlap, so frame time is the
+    slowest stage rather than the sum. Results pass through a 1-slot queue
+    that drops the stale result when the UI falls behind, keeping latency
+    bounded like the live stream itself. Counting happens here, before that
+    drop, so only the display frame is lost, never its vehicles.
+    """
+
+    def __init__(self, stream, model, confidence_threshold):
+        self.stream = stream
+        self.model = model
+        self.confidence_threshold = confidence_threshold
+        self.results = queue.Queue(maxsize=1)
+        self._lock = threading.Lock()
+        self._pending_counts = dict.fromkeys(_COUNT_NAMES, 0)
+        self._pending_timeline = []
+        self._running = True
+        self._thread = threading.Thread(target=self._infer_loop, daemon=True)
+        self._thread.start()
+
+    def _infer_loop(self):
+        while self._running:
+            ret, frame = self.stream.read()
+            if not ret:
+                self._publish((False, None, None))
+                break
+            detections = run_vehicle_detection(self.model, frame, self.confidence_threshold)
+            with self._lock:
+                self._pending_timeline.append(count_detections(self._pending_counts, detections))
+            self._publish((True, frame, detections))
+
+    def _publish(self, item):
+        try:
+            self.results.put(item, block=False)
+        except queue.Full:
+            try:
+                self.results.get(block=False)
+            except queue.Empty:
+                pass
+            self.results.put(item, block=False)
+
+    def get(self, timeout: float = 5.0):
+        """Return (ok, frame, detections) for the newest processed frame."""
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return False, None, None
+
+    def take_counts(self, counts, timeline) -> int:
+        """
+        Move the counts of every frame processed since the last call, including
+        frames whose results were dropped, into `counts` and `timeline`.
+        Returns the number of frames moved.
+        """
+        with self._lock:
+            for name, n in self._pending_counts.items():
+                if n:
+                    counts[name] += n
+                    self._pending_counts[name] = 0
+            timeline.extend(self._pending_timeline)
+            frames = len(self._pending_timeline)
+            self._pending_timeline.clear()
+        return frames
+
+    def stop(self):
+        """Stop the inference thread and release the capture it reads from."""
+        self._running = False
+        self.stream.release()
+        self._thread.join(timeout=1.0)
+
+
 # ============================================================================
 # DETECTION FUNCTIONS
 # ============================================================================
 
+class Detections(NamedTuple):
+    """Vehicle detections for one frame as parallel arrays (frame coordinates)."""
+    class_ids: np.ndarray    # (N,) int64 COCO class ids
+    confidences: np.ndarray  # (N,) float32
+    boxes: np.ndarray        # (N, 4) int32 x1, y1, x2, y2
+
+NO_DETECTIONS = Detections(
+    np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.int32)
+)
+
+# The vehicle class set is fixed at startup, so counting only needs bins up to
+# the largest vehicle id and a precomputed id -> name order
+_COUNT_BINS = int(VEHICLE_CLASS_IDS.max()) + 1
+_COUNT_NAMES = tuple(VEHICLE_CLASSES.values())
+
+def count_detections(counts, detections):
+    """Add one frame's detections to the per-class counts dict; returns the frame total."""
+    class_ids = detections.class_ids
+    if len(class_ids) == 0:
+        return 0
+    per_class = np.bincount(class_ids, minlength=_COUNT_BINS)[VEHICLE_CLASS_IDS]
+    for name, n in zip(_COUNT_NAMES, per_class.tolist()):
+        if n:
+            counts[name] += n
+    return len(class_ids)
+
+# Per-thread scratch buffers reused across frames. The model (and so the
+# preprocessing) is shared by every Streamlit session, so a module-global
+# buffer could be refilled by another session mid-frame.
+_thread_bufs = threading.local()
+
+def _letterbox_buf():
+    """The calling thread's (S, S, 3) uint8 letterbox buffer."""
+    buf = getattr(_thread_bufs, "letterbox", None)
+    if buf is None:
+        buf = _thread_bufs.letterbox = np.full((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, 3), 114, dtype=np.uint8)
+    return buf
+
+def letterbox(frame):
+    """
+    Resize frame so its long side is MODEL_INPUT_SIZE and pad (top-left
+    aligned) into this thread's letterbox buffer. Returns (image, scale);
+    the image is valid until the thread's next letterbox() call.
+    """
+    h, w = frame.shape[:2]
+    scale = MODEL_INPUT_SIZE / max(h, w)
+    new_w = min(MODEL_INPUT_SIZE, round(w * scale))
+    new_h = min(MODEL_INPUT_SIZE, round(h * scale))
+    
+    if OPENCL_AVAILABLE:
+        resized = cv2.resize(cv2.UMat(frame), (new_w, new_h), interpolation=cv2.INTER_LINEAR).get()
+    else:
+        resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    buf = _letterbox_buf()
+    buf[:new_h, :new_w] = resized
+    buf[new_h:, :] = 114
+    buf[:new_h, new_w:] = 114
+    return buf, scale
+
+def letterbox_cuda(frame):
+    """
+    GPU counterpart of letterbox(): upload the BGR frame once, then resize,
+    pad, BGR->RGB, HWC->CHW and /255 on the device. Returns a (1, 3, S, S)
+    float tensor ready for Ultralytics, plus the scale.
+    """
+    import torch
+    import torch.nn.functional as F
+    
+    h, w = frame.shape[:2]
+    scale = MODEL_INPUT_SIZE / max(h, w)
+    new_w = min(MODEL_INPUT_SIZE, round(w * scale))
+    new_h = min(MODEL_INPUT_SIZE, round(h * scale))
+    
+    src = torch.from_numpy(frame).to("cuda", non_blocking=True)
+    src = src.flip(-1).permute(2, 0, 1).unsqueeze(0).float()
+    blob = torch.full((1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), 114.0, device="cuda")
+    blob[..., :new_h, :new_w] = F.interpolate(src, size=(new_h, new_w), mode="bilinear", align_corners=False)
+    return blob.div_(255.0), scale
+
+def _filter_vehicle_anchors_kernel(out, conf_thr, cls_ids, dets):
+    """
+    Fused argmax + vehicle-class filter + score threshold over the raw
+    (84, N) output. Writes cx, cy, w, h, conf, cls rows into `dets` and
+    returns the number of rows written.
+    """
+    num_classes = out.shape[0] - 4
+    n = 0
+    for i in range(out.shape[1]):
+        best = 0
+        best_score = out[4, i]
+        for c in range(1, num_classes):
+            if out[4 + c, i] > best_score:
+                best = c
+                best_score = out[4 + c, i]
+        if best_score <= conf_thr:
+            continue
+        is_vehicle = False
+        for cid in cls_ids:
+            if best == cid:
+                is_vehicle = True
+                break
+        if not is_vehicle:
+            continue
+        dets[n, 0] = out[0, i]
+        dets[n, 1] = out[1, i]
+        dets[n, 2] = out[2, i]
+        dets[n, 3] = out[3, i]
+        dets[n, 4] = best_score
+        dets[n, 5] = best
+        n += 1
+    return n
+
+if NUMBA_AVAILABLE:
+    _filter_vehicle_anchors_kernel = njit(cache=True, fastmath=True)(_filter_vehicle_anchors_kernel)
+
+def filter_vehicle_anchors(out, confidence_threshold):
+    """
+    Keep anchors whose best class is a vehicle scoring above the threshold.
+    `out` is the raw (84, N) model output; returns (cxcywh, conf, cls).
+    """
+    if NUMBA_AVAILABLE:
+        # Per-thread output rows (see _thread_bufs); dets views stay private to this thread
+        buf = getattr(_thread_bufs, "anchors", None)
+        if buf is None or len(buf) < out.shape[1]:
+            buf = _thread_bufs.anchors = np.empty((out.shape[1], 6), dtype=np.float32)
+        n = _filter_vehicle_anchors_kernel(out, np.float32(confidence_threshold), VEHICLE_CLASS_IDS, buf)
+        dets = buf[:n]
+        return dets[:, :4], dets[:, 4], dets[:, 5].astype(np.int64)
+    
+    # Vectorized NumPy fallback: rows are anchors after the transpose
+    out = out.T
+    scores = out[:, 4:]
+    cls = scores.argmax(axis=1)
+    conf = scores[np.arange(len(cls)), cls]
+    mask = np.isin(cls, VEHICLE_CLASS_IDS) & (conf > confidence_threshold)
+    return out[mask, :4], conf[mask], cls[mask]
+
+def nms_numpy(boxes, scores, iou_thr=NMS_IOU_THRESHOLD):
+    """
+    Greedy non-maximum suppression on (N, 4) xyxy boxes.
+    Returns the indices of kept boxes, highest score first.
+    """
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        iw = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        ih = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = iw * ih
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-7)
+        order = rest[iou <= iou_thr]
+    
+    return np.array(keep, dtype=np.int64)
+
+def _run_onnx_detection(detector, image, scale, frame_shape, confidence_threshold):
+    """Run the ONNX model on a letterboxed image and decode the raw (1, 84, 8400) output."""
+    h, w = frame_shape
+    # BGR HWC uint8 -> RGB CHW float32 in [0, 1], written straight into the blob
+    np.multiply(image[..., ::-1].transpose(2, 0, 1), np.float32(1 / 255.0),
+                out=detector.blob[0], dtype=np.float32)
+    out = detector.run()
+    
+    cxcywh, conf, cls = filter_vehicle_anchors(out, confidence_threshold)
+    if len(conf) == 0:
+        return NO_DETECTIONS
+    
+    cx, cy, bw, bh = cxcywh.T / scale
+    boxes = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+    
+    # Per-class NMS in one pass: offset each class into its own coordinate range
+    offsets = (cls * (max(h, w) + 1))[:, None]
+    keep = nms_numpy(boxes + offsets, conf)
+    
+    boxes = boxes[keep]
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w - 1)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h - 1)
+    
+    return Detections(cls[keep].astype(np.int64), conf[keep].astype(np.float32), boxes.astype(np.int32))
+
 def run_vehicle_detection(model, frame, confidence_threshold):
     """Run YOLOv8 inference and filter for vehicles."""
-    results = model(frame, conf=confidence_threshold, verbose=False)
+    h, w = frame.shape[:2]
     
-    vehicle_detections = []
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            class_id = int(box.cls[0])
-            if class_id in VEHICLE_CLASSES:
-                conf = float(box.conf[0])
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                class_name = VEHICLE_CLASSES[class_id]
-                vehicle_detections.append((class_name, conf, x1, y1, x2, y2))
+    if isinstance(model, OnnxVehicleDetector):
+        image, scale = letterbox(frame)
+        return _run_onnx_detection(model, image, scale, (h, w), confidence_threshold)
     
-    return vehicle_detections
+    # CUDA models get preprocessed on the GPU; CPU models keep the NumPy letterbox
+    if model.overrides.get("device") == 0:
+        image, scale = letterbox_cuda(frame)
+    else:
+        image, scale = letterbox(frame)
+    return _decode_ultralytics_result(model(image, conf=confidence_threshold, **YOLO_PREDICT_ARGS)[0], scale, (h, w))
+
+def _decode_ultralytics_result(r, scale, frame_shape):
+    """Turn one Ultralytics Results object into vehicle Detections in frame coordinates."""
+    h, w = frame_shape
+    # One bulk tensor -> NumPy transfer per field instead of per-box scalar syncs
+    cls = r.boxes.cls.cpu().numpy().astype(np.int64)
+    mask = np.isin(cls, VEHICLE_CLASS_IDS)
+    if not mask.any():
+        return NO_DETECTIONS
+    conf = r.boxes.conf.cpu().numpy()[mask]
+    xyxy = r.boxes.xyxy.cpu().numpy()[mask] / scale
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w - 1)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h - 1)
+    
+    return Detections(cls[mask], conf.astype(np.float32), xyxy.astype(np.int32))
+
+def run_vehicle_detection_batch(model, frames, confidence_threshold):
+    """
+    Run detection on several frames in one model call (Ultralytics models),
+    returning one Detections per frame. The ONNX export has a fixed
+    batch of 1, so that path runs frame by frame.
+    """
+    if isinstance(model, OnnxVehicleDetector) or len(frames) == 1:
+        return [run_vehicle_detection(model, f, confidence_threshold) for f in frames]
+    
+    images, scales = [], []
+    on_cuda = model.overrides.get("device") == 0
+    for f in frames:
+        image, scale = letterbox_cuda(f) if on_cuda else letterbox(f)
+        images.append(image if on_cuda else image.copy())  # letterbox reuses one buffer
+        scales.append(scale)
+    
+    if on_cuda:
+        import torch
+        images = torch.cat(images)
+    results = model(images, conf=confidence_threshold, **YOLO_PREDICT_ARGS)
+    return [_decode_ultralytics_result(r, scale, f.shape[:2]) for r, scale, f in zip(results, scales, frames)]
+
+def _rect_polylines(boxes):
+    """Build the (N, 4, 2) closed outlines for (N, 4) xyxy boxes."""
+    x1, y1, x2, y2 = boxes.T
+    return np.stack([x1, y1, x2, y1, x2, y2, x1, y2], axis=1).reshape(-1, 4, 2).astype(np.int32)
+
+def _corner_polylines(boxes, cl=15):
+    """Build the (N*4, 3, 2) L-shaped corner accents for (N, 4) xyxy boxes."""
+    x1, y1, x2, y2 = boxes.T
+    polys = np.stack([
+        np.stack([x1 + cl, y1, x1, y1, x1, y1 + cl], axis=1),
+        np.stack([x2 - cl, y1, x2, y1, x2, y1 + cl], axis=1),
+        np.stack([x1 + cl, y2, x1, y2, x1, y2 - cl], axis=1),
+        np.stack([x2 - cl, y2, x2, y2, x2, y2 - cl], axis=1),
+    ], axis=1)
+    return polys.reshape(-1, 3, 2).astype(np.int32)
+
+# One label strip per (vehicle class, integer percent 0-100)
+_LABEL_CACHE_SIZE = len(VEHICLE_CLASSES) * 101
+
+@functools.lru_cache(maxsize=_LABEL_CACHE_SIZE)
+def _text_size(label):
+    """Cached cv2.getTextSize for the label font; returns (width, height)."""
+    return cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
+
+@functools.lru_cache(maxsize=_LABEL_CACHE_SIZE)
+def _label_strip(class_id, conf_pct):
+    """Pre-rendered label badge: class-colored background with black text baked in."""
+    label = f"{CLASS_NAMES[class_id].upper()} {conf_pct}%"
+    tw, th = _text_size(label)
+    strip = np.empty((th + 10, tw + 10, 3), dtype=np.uint8)
+    strip[:] = CLASS_COLORS_BGR[class_id]
+    cv2.putText(strip, label, (5, th + 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+    return strip
+
+def _blit_label(img, strip, x1, y1):
+    """Copy a label strip so its bottom-left corner sits at (x1, y1), clipped to img."""
+    sh, sw = strip.shape[:2]
+    top = y1 - sh
+    ys, xs = max(top, 0), max(x1, 0)
+    ye, xe = min(y1, img.shape[0]), min(x1 + sw, img.shape[1])
+    if ye > ys and xe > xs:
+        img[ys:ye, xs:xe] = strip[ys - top:ye - top, xs - x1:xe - x1]
 
 def draw_bounding_boxes(frame, detections, show_timestamp=False):
-    """Draw styled bounding boxes on frame."""
-    annotated = frame.copy()
+    """Draw styled bounding boxes in-place on frame (caller must own it)."""
+    annotated = frame
     
-    for class_name, conf, x1, y1, x2, y2 in detections:
-        color = VEHICLE_COLORS.get(class_name, (255, 255, 255))
-        
-        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-        
-        # Corner accents
-        cl = 15
-        cv2.line(annotated, (x1, y1), (x1 + cl, y1), color, 3)
-        cv2.line(annotated, (x1, y1), (x1, y1 + cl), color, 3)
-        cv2.line(annotated, (x2, y1), (x2 - cl, y1), color, 3)
-        cv2.line(annotated, (x2, y1), (x2, y1 + cl), color, 3)
-        cv2.line(annotated, (x1, y2), (x1 + cl, y2), color, 3)
-        cv2.line(annotated, (x1, y2), (x1, y2 - cl), color, 3)
-        cv2.line(annotated, (x2, y2), (x2 - cl, y2), color, 3)
-        cv2.line(annotated, (x2, y2), (x2, y2 - cl), color, 3)
-        
-        # Label
-        label = f"{class_name.upper()} {conf:.0%}"
-        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-        cv2.rectangle(annotated, (x1, y1 - th - 10), (x1 + tw + 10, y1), color, -1)
-        cv2.putText(annotated, label, (x1 + 5, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+    class_ids, confidences, boxes = detections
+    
+    # Boxes and corner accents, one polylines call each per class color
+    for class_id in np.unique(class_ids).tolist():
+        color = CLASS_COLORS_BGR[class_id].tolist()
+        class_boxes = boxes[class_ids == class_id]
+        cv2.polylines(annotated, _rect_polylines(class_boxes), True, color, 2)
+        cv2.polylines(annotated, _corner_polylines(class_boxes), False, color, 3)
+    
+    # Labels, keyed on the whole percent shown ({conf:.0%}) so every strip is cached
+    conf_pcts = np.rint(confidences * 100).astype(np.int64)
+    for class_id, conf_pct, (x1, y1, _, _) in zip(class_ids.tolist(), conf_pcts.tolist(), boxes.tolist()):
+        _blit_label(annotated, _label_strip(class_id, conf_pct), x1, y1)
     
     # Timestamp overlay for RTSP live feed
     if show_timestamp:
@@ -385,19 +1199,26 @@ def draw_bounding_boxes(frame, detections, show_timestamp=False):
     
     return annotated
 
+def encode_display_frame(frame):
+    """Downscale to the display width and JPEG-encode (much cheaper than st.image's PNG)."""
+    h, w = frame.shape[:2]
+    if w > DISPLAY_MAX_WIDTH:
+        # Stays a UMat on OpenCL hosts; imencode downloads it only once
+        if OPENCL_AVAILABLE:
+            frame = cv2.UMat(frame)
+        frame = cv2.resize(frame, (DISPLAY_MAX_WIDTH, int(h * DISPLAY_MAX_WIDTH / w)), interpolation=cv2.INTER_AREA)
+    _, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, DISPLAY_JPEG_QUALITY])
+    return buf.tobytes()
+
 # ============================================================================
 # CHART FUNCTIONS
 # ============================================================================
 
-def create_pie_chart(counts):
-    """Create premium pie chart."""
-    labels = [l.capitalize() for l in counts.keys()]
-    values = list(counts.values())
-    if sum(values) == 0:
-        values = [1, 1, 1, 1]
-    
+@st.cache_resource
+def _pie_template():
+    """Styled pie figure built once; create_pie_chart copies it and swaps the data."""
     fig = go.Figure(data=[go.Pie(
-        labels=labels, values=values, hole=0.55,
+        labels=[], values=[], hole=0.55,
         marker=dict(colors=CHART_COLORS, line=dict(color='#1a1a2e', width=3)),
         textinfo='label+percent', textfont=dict(color='white', size=12, family='Inter'),
         hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}<extra></extra>',
@@ -411,30 +1232,46 @@ def create_pie_chart(counts):
         margin=dict(l=20, r=20, t=40, b=20),
         height=260,
         title=dict(text='Distribution', font=dict(color='#94a3b8', size=14, family='Inter'), x=0.5),
-        annotations=[dict(text=f'{sum(counts.values())}', x=0.5, y=0.5, font_size=28, 
+        annotations=[dict(text='0', x=0.5, y=0.5, font_size=28, 
                          font_color='white', font_family='Inter', showarrow=False)]
     )
     return fig
 
-def create_timeline_chart(timeline):
-    """Create premium timeline chart."""
+# cache_resource hands back the figure itself; cache_data would pickle and
+# unpickle it on every hit. The figure is only rendered, never mutated
+@st.cache_resource(max_entries=256)
+def _pie_chart_cached(count_items):
+    labels = [l.capitalize() for l, _ in count_items]
+    total = sum(v for _, v in count_items)
+    values = [v for _, v in count_items] if total > 0 else [1, 1, 1, 1]
+    
+    fig = go.Figure(_pie_template())
+    fig.data[0].labels = labels
+    fig.data[0].values = values
+    fig.layout.annotations[0].text = f'{total}'
+    return fig
+
+def create_pie_chart(counts):
+    """Create premium pie chart (memoized on the counts, which change slowly)."""
+    return _pie_chart_cached(tuple(counts.items()))
+
+@st.cache_resource
+def _timeline_template():
+    """Styled two-trace timeline figure built once; create_timeline_chart fills in x/y."""
     fig = go.Figure()
     
-    if timeline:
-        x = list(range(1, len(timeline) + 1))
-        
-        fig.add_trace(go.Scatter(
-            x=x, y=timeline, mode='lines',
-            fill='tozeroy', fillcolor='rgba(0, 212, 255, 0.1)',
-            line=dict(color='#00d4ff', width=0), hoverinfo='skip'
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=x, y=timeline, mode='lines+markers',
-            line=dict(color='#00d4ff', width=3, shape='spline'),
-            marker=dict(size=6, color='#00d4ff', line=dict(color='white', width=2)),
-            hovertemplate='<b>Frame %{x}</b><br>Vehicles: %{y}<extra></extra>'
-        ))
+    fig.add_trace(go.Scatter(
+        x=[], y=[], mode='lines',
+        fill='tozeroy', fillcolor='rgba(0, 212, 255, 0.1)',
+        line=dict(color='#00d4ff', width=0), hoverinfo='skip'
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=[], y=[], mode='lines+markers',
+        line=dict(color='#00d4ff', width=3, shape='spline'),
+        marker=dict(size=6, color='#00d4ff', line=dict(color='white', width=2)),
+        hovertemplate='<b>Frame %{x}</b><br>Vehicles: %{y}<extra></extra>'
+    ))
     
     fig.update_layout(
         paper_bgcolor='rgba(0,0,0,0)',
@@ -457,6 +1294,19 @@ def create_timeline_chart(timeline):
     )
     return fig
 
+def create_timeline_chart(timeline):
+    """Create premium timeline chart (a copy of the template with the data filled in)."""
+    fig = go.Figure(_timeline_template())
+    
+    if timeline:
+        x = list(range(1, len(timeline) + 1))
+        y = list(timeline)
+        for trace in fig.data:
+            trace.x = x
+            trace.y = y
+    
+    return fig
+
 def stat_card(icon, label, value, card_type=""):
     return f'''
     <div class="stat-card {card_type}">
@@ -475,7 +1325,7 @@ def main():
     if 'counts' not in st.session_state:
         st.session_state.counts = {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0}
     if 'timeline' not in st.session_state:
-        st.session_state.timeline = []
+        st.session_state.timeline = deque(maxlen=100)
     if 'running' not in st.session_state:
         st.session_state.running = False
     if 'input_mode' not in st.session_state:
@@ -595,7 +1445,7 @@ def main():
         
         st.markdown("<br>", unsafe_allow_html=True)
         pie_placeholder = st.empty()
-        pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config={'displayModeBar': False}, key="pie_init")
+        pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config=CHART_CONFIG, key="pie_init")
     
     with col_video:
         feed_title = "Live CCTV Feed" if st.session_state.input_mode == "rtsp" else "Video Feed"
@@ -617,7 +1467,7 @@ def main():
     
     st.markdown("<br>", unsafe_allow_html=True)
     timeline_placeholder = st.empty()
-    timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config={'displayModeBar': False}, key="timeline_init")
+    timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config=CHART_CONFIG, key="timeline_init")
     
     # ========================================================================
     # VIDEO FILE PROCESSING
@@ -625,7 +1475,7 @@ def main():
     if start and st.session_state.input_mode == "file" and uploaded:
         st.session_state.running = True
         st.session_state.counts = {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0}
-        st.session_state.timeline = []
+        st.session_state.timeline = deque(maxlen=100)
         
         with st.spinner("Loading YOLOv8 model..."):
             model = load_yolo_model()
@@ -647,45 +1497,53 @@ def main():
         frame_count = 0
         processed = 0
         
+        batch_size = 1 if isinstance(model, OnnxVehicleDetector) else BATCH_SIZE
+        stream = PrefetchCapture(cap, frame_skip, maxsize=2 * batch_size)
+        last_chart_counts = None
+        exhausted = False
+        
         while st.session_state.running:
-            ret, frame = cap.read()
-            if not ret:
+            frames = []
+            while len(frames) < batch_size and not exhausted:
+                ret, frame = stream.read()
+                if not ret:
+                    exhausted = True
+                    break
+                frames.append(frame)
+            
+            if not frames:
                 status_placeholder.success("Processing Complete!")
                 st.session_state.running = False
                 break
             
-            frame_count += 1
-            if frame_count % frame_skip != 0:
-                continue
-            
-            processed += 1
-            detections = run_vehicle_detection(model, frame, conf_threshold)
-            
-            frame_vehicles = 0
-            for cls_name, *_ in detections:
-                st.session_state.counts[cls_name] += 1
-                frame_vehicles += 1
+            frame_count += frame_skip * len(frames)
+            prev_processed = processed
+            processed += len(frames)
+            batch_detections = run_vehicle_detection_batch(model, frames, conf_threshold)
             
-            st.session_state.timeline.append(frame_vehicles)
-            if len(st.session_state.timeline) > 100:
-                st.session_state.timeline = st.session_state.timeline[-100:]
+            for detections in batch_detections:
+                frame_vehicles = count_detections(st.session_state.counts, detections)
+                st.session_state.timeline.append(frame_vehicles)
             
-            annotated = draw_bounding_boxes(frame, detections, show_timestamp=False)
-            rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-            video_placeholder.image(rgb, channels="RGB", use_container_width=True)
+            # Only the newest frame of the batch is drawn and shown
+            annotated = draw_bounding_boxes(frames[-1], batch_detections[-1], show_timestamp=False)
+            video_placeholder.image(encode_display_frame(annotated), use_container_width=True)
             
-            if processed % 5 == 0:
-                pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config={'displayModeBar': False}, key=f"pie_{processed}")
-                timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config={'displayModeBar': False}, key=f"timeline_{processed}")
+            if processed // CHART_REFRESH_EVERY != prev_processed // CHART_REFRESH_EVERY:
+                # Unchanged counts mean no vehicles since the last refresh: skip the pie.
+                # The timeline still gained (zero) points, so it always redraws
+                chart_counts = tuple(st.session_state.counts.values())
+                if chart_counts != last_chart_counts:
+                    last_chart_counts = chart_counts
+                    pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config=LIVE_CHART_CONFIG, key=f"pie_{processed}")
+                timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config=LIVE_CHART_CONFIG, key=f"timeline_{processed}")
             
-            progress = frame_count / total_frames
+            progress = min(frame_count / total_frames, 1.0)
             status_placeholder.progress(progress, text=f"Frame {frame_count}/{total_frames} | Detected: {frame_vehicles}")
-            
-            time.sleep(0.01)
         
-        cap.release()
-        pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config={'displayModeBar': False}, key="pie_final")
-        timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config={'displayModeBar': False}, key="timeline_final")
+        stream.release()
+        pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config=CHART_CONFIG, key="pie_final")
+        timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config=CHART_CONFIG, key="timeline_final")
         st.balloons()
     
     # ========================================================================
@@ -694,7 +1552,7 @@ def main():
     if start and st.session_state.input_mode == "rtsp" and rtsp_url:
         st.session_state.running = True
         st.session_state.counts = {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0}
-        st.session_state.timeline = []
+        st.session_state.timeline = deque(maxlen=100)
         
         with st.spinner("Loading YOLOv8 model..."):
             model = load_yolo_model()
@@ -703,11 +1561,23 @@ def main():
             st.session_state.running = False
             return
         
-        # --- Try connecting with TCP first, then UDP ---
+        # --- Try hardware decode (NVDEC, GStreamer), then FFmpeg TCP, then UDP ---
         cap = None
         connected = False
         
-        for transport in ["tcp", "udp"]:
+        status_placeholder.info("Connecting to camera (HW decode)...")
+        cap = create_rtsp_capture_hw(rtsp_url)
+        if cap is not None:
+            ret, test_frame = cap.read()
+            if ret:
+                connected = True
+                status_placeholder.success("Connected to CCTV (HW decode)!")
+                time.sleep(0.5)
+            else:
+                cap.release()
+                cap = None
+        
+        for transport in ([] if connected else ["tcp", "udp"]):
             status_placeholder.info(f"Connecting to camera ({transport.upper()})...")
             cap = create_rtsp_capture(rtsp_url, transport)
             if cap is not None and cap.isOpened():
@@ -737,20 +1607,29 @@ def main():
         processed = 0
         reconnect_attempts = 0
         max_reconnect = 5
+        last_chart_counts = None
+        worker = InferenceWorker(ThreadedCapture(cap, frame_skip), model, conf_threshold)
+        period = 1.0 / LIVE_TARGET_FPS
+        next_tick = time.perf_counter()
         
         while st.session_state.running:
-            ret, frame = cap.read()
+            ret, frame, detections = worker.get()
+            # Drain before any reconnect replaces the worker
+            frames_counted = worker.take_counts(st.session_state.counts, st.session_state.timeline)
+            frame_count += frames_counted * frame_skip
             
             # --- Handle connection loss ---
             if not ret:
                 reconnect_attempts += 1
                 if reconnect_attempts <= max_reconnect:
                     status_placeholder.warning(f"Connection lost. Reconnecting... ({reconnect_attempts}/{max_reconnect})")
-                    cap.release()
+                    worker.stop()
                     time.sleep(3)
                     
-                    # Try both transports on reconnect
-                    cap = create_rtsp_capture(rtsp_url, "tcp")
+                    # Try hardware decode, then both transports on reconnect
+                    cap = create_rtsp_capture_hw(rtsp_url)
+                    if cap is None:
+                        cap = create_rtsp_capture(rtsp_url, "tcp")
                     if cap is None or not cap.isOpened():
                         cap = create_rtsp_capture(rtsp_url, "udp")
                     if cap is None or not cap.isOpened():
@@ -761,6 +1640,9 @@ def main():
                     if ret_test:
                         status_placeholder.success("Reconnected!")
                         reconnect_attempts = 0
+                        worker = InferenceWorker(ThreadedCapture(cap, frame_skip), model, conf_threshold)
+                    else:
+                        cap.release()
                     continue
                 else:
                     status_placeholder.error("Connection lost. Max reconnect attempts reached.")
@@ -768,40 +1650,36 @@ def main():
                     break
             
             reconnect_attempts = 0
-            frame_count += 1
-            
-            if frame_count % frame_skip != 0:
-                continue
-            
             processed += 1
-            detections = run_vehicle_detection(model, frame, conf_threshold)
-            
-            frame_vehicles = 0
-            for cls_name, *_ in detections:
-                st.session_state.counts[cls_name] += 1
-                frame_vehicles += 1
-            
-            st.session_state.timeline.append(frame_vehicles)
-            if len(st.session_state.timeline) > 100:
-                st.session_state.timeline = st.session_state.timeline[-100:]
+            frame_vehicles = len(detections.class_ids)
             
             annotated = draw_bounding_boxes(frame, detections, show_timestamp=True)
-            rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-            video_placeholder.image(rgb, channels="RGB", use_container_width=True)
+            video_placeholder.image(encode_display_frame(annotated), use_container_width=True)
             
-            if processed % 5 == 0:
-                pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config={'displayModeBar': False}, key=f"pie_rtsp_{processed}")
-                timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config={'displayModeBar': False}, key=f"timeline_rtsp_{processed}")
+            if processed % CHART_REFRESH_EVERY_RTSP == 0:
+                # Unchanged counts mean no vehicles since the last refresh: skip the pie.
+                # The timeline still gained (zero) points, so it always redraws
+                chart_counts = tuple(st.session_state.counts.values())
+                if chart_counts != last_chart_counts:
+                    last_chart_counts = chart_counts
+                    pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config=LIVE_CHART_CONFIG, key=f"pie_rtsp_{processed}")
+                timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config=LIVE_CHART_CONFIG, key=f"timeline_rtsp_{processed}")
             
             current_time = datetime.now().strftime("%H:%M:%S")
             total = sum(st.session_state.counts.values())
             status_placeholder.markdown(f"🔴 **LIVE** | {current_time} | Frames: {frame_count} | Detected: {frame_vehicles} | Total: {total}")
             
-            time.sleep(0.01)
+            # Sleep only when ahead of schedule; resync after a slow iteration
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()
         
-        cap.release()
-        pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config={'displayModeBar': False}, key="pie_rtsp_final")
-        timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config={'displayModeBar': False}, key="timeline_rtsp_final")
+        worker.stop()
+        pie_placeholder.plotly_chart(create_pie_chart(st.session_state.counts), use_container_width=True, config=CHART_CONFIG, key="pie_rtsp_final")
+        timeline_placeholder.plotly_chart(create_timeline_chart(st.session_state.timeline), use_container_width=True, config=CHART_CONFIG, key="timeline_rtsp_final")
 
 if __name__ == "__main__":
     main()
@@ -9,6 +9,8 @@ All sub-categories are ESTIMATED — fine-grained classification requires custom
 model training on Indonesian vehicle datasets.
 """
 
+import numpy as np
+
 # ============================================================================
 # TAXONOMY DEFINITION
 # ============================================================================
@@ -63,6 +65,37 @@ for cat_id, cat in BUSINESS_CATEGORIES.items():
     for sub_id, sub_label in cat["subcategories"].items():
         _SUBCAT_LOOKUP[sub_id] = (cat_id, sub_label)
 
+# Index tables for the vectorized path: detections carry a class index into
+# DETECTION_CLASSES and are classified into indices into SUBCATEGORY_IDS
+DETECTION_CLASSES = ("car", "motorcycle", "bus", "truck", "bicycle")
+CAR, MOTORCYCLE, BUS, TRUCK, BICYCLE = range(len(DETECTION_CLASSES))
+_CLASS_INDEX = {name: i for i, name in enumerate(DETECTION_CLASSES)}
+
+SUBCATEGORY_IDS = tuple(_SUBCAT_LOOKUP)
+CATEGORY_IDS = tuple(BUSINESS_CATEGORIES)
+_SUBCAT_INDEX = {sub_id: i for i, sub_id in enumerate(SUBCATEGORY_IDS)}
+_SUBCAT_CATEGORY = np.array(
+    [CATEGORY_IDS.index(_SUBCAT_LOOKUP[sub_id][0]) for sub_id in SUBCATEGORY_IDS]
+)
+
+# Branchless lookup: subcategory = _SUBCAT_LUT[class_row, coverage_bucket],
+# where the bucket counts how many of the class's coverage thresholds the box
+# reaches. The last row is the special-vehicle fallback for unknown classes.
+_SPECIAL_ROW = len(DETECTION_CLASSES)
+_SUBCAT_LUT = np.array([
+    [_SUBCAT_INDEX[sub_id] for sub_id in row] for row in (
+        ["passenger_car"] * 4,
+        ["motorcycle"] * 4,
+        ["angkot", "city_bus", "intercity_bus", "intercity_bus"],
+        ["pickup", "light_truck", "heavy_truck", "trailer"],
+        ["bicycle"] * 4,
+        ["special_vehicle"] * 4,
+    )
+], dtype=np.uint8)
+_COVERAGE_THRESHOLDS = np.full((len(_SUBCAT_LUT), 3), np.inf)
+_COVERAGE_THRESHOLDS[BUS, :2] = (0.08, 0.20)
+_COVERAGE_THRESHOLDS[TRUCK] = (0.05, 0.12, 0.25)
+
 
 def empty_business_counts():
     """Return a fresh zero-filled business counts dict."""
@@ -153,6 +186,31 @@ def classify_detection(det, frame_width, frame_height):
         return "special", "special_vehicle"
 
 
+def classify_detections_array(detections, frame_width, frame_height):
+    """
+    Classify all detections in a single frame at once (same rules as
+    classify_detection, evaluated as array math).
+
+    Args:
+        detections: (N, 5) array of [class_idx, x1, y1, x2, y2], class_idx
+            indexing DETECTION_CLASSES (any other value → special vehicle)
+        frame_width: width of the video frame in pixels
+        frame_height: height of the video frame in pixels
+
+    Returns:
+        np.ndarray: (N,) indices into SUBCATEGORY_IDS
+    """
+    dets = np.asarray(detections, dtype=np.float64).reshape(-1, 5)
+    cls = dets[:, 0].astype(np.int64)
+    frame_area = frame_width * frame_height
+    area = (dets[:, 3] - dets[:, 1]) * (dets[:, 4] - dets[:, 2])
+    coverage = area / frame_area if frame_area > 0 else np.zeros(len(dets))
+
+    rows = np.where((cls >= 0) & (cls < _SPECIAL_ROW), cls, _SPECIAL_ROW)
+    buckets = (coverage[:, None] >= _COVERAGE_THRESHOLDS[rows]).sum(axis=1)
+    return _SUBCAT_LUT[rows, buckets]
+
+
 def classify_frame_detections(detections, frame_width, frame_height):
     """
     Classify all detections in a single frame.
@@ -160,12 +218,20 @@ def classify_frame_detections(detections, frame_width, frame_height):
     Returns:
         list of dicts, each with added keys: category, subcategory
     """
+    if not detections:
+        return []
+    dets = np.array([
+        (_CLASS_INDEX.get(det["class_name"], -1), det["x1"], det["y1"], det["x2"], det["y2"])
+        for det in detections
+    ], dtype=np.float64)
+    sub_idx = classify_detections_array(dets, frame_width, frame_height)
+
     enriched = []
-    for det in detections:
-        cat_id, subcat_id = classify_detection(det, frame_width, frame_height)
+    for det, i in zip(detections, sub_idx.tolist()):
+        subcat_id = SUBCATEGORY_IDS[i]
         enriched.append({
             **det,
-            "category": cat_id,
+            "category": _SUBCAT_LOOKUP[subcat_id][0],
             "subcategory": subcat_id,
         })
     return enriched
@@ -182,6 +248,20 @@ def accumulate_business_counts(business_counts, enriched_detections):
         business_counts["subcategories"][sub] = business_counts["subcategories"].get(sub, 0) + 1
 
 
+def accumulate_subcategory_indices(business_counts, subcategory_indices):
+    """
+    Add classified detections (output of classify_detections_array) to
+    running business counts (in-place).
+    """
+    sub_counts = np.bincount(subcategory_indices, minlength=len(SUBCATEGORY_IDS))
+    cat_counts = np.bincount(_SUBCAT_CATEGORY, weights=sub_counts, minlength=len(CATEGORY_IDS))
+
+    for sub_id, n in zip(SUBCATEGORY_IDS, sub_counts.tolist()):
+        business_counts["subcategories"][sub_id] = business_counts["subcategories"].get(sub_id, 0) + n
+    for cat_id, n in zip(CATEGORY_IDS, cat_counts.astype(np.int64).tolist()):
+        business_counts["categories"][cat_id] = business_counts["categories"].get(cat_id, 0) + n
+
+
 def get_taxonomy_metadata():
     """Return category/subcategory labels and icons for the frontend."""
     return BUSINESS_CATEGORIES
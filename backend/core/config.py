@@ -36,6 +36,9 @@ class Settings(BaseSettings):
     BROADCAST_FPS: int = 15        # WebSocket send rate
     META_EVERY_N: int = 5          # Send metadata every Nth broadcast
 
+    # ── Threading ──────────────────────────────────────
+    CPU_PINNING: bool = True       # Pin inference/capture threads (Linux, CUDA, 4+ cores)
+
     # ── Encoding ───────────────────────────────────────
     JPEG_QUALITY: int = 75         # JPEG encode quality (0-100)
     FRAME_RESIZE_WIDTH: int = 960  # Resize annotated frame before encode
@@ -51,3 +54,11 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
+
+# Hot-path values bound once as plain module constants (read per frame)
+IMGSZ = settings.IMGSZ
+CONF_THRESHOLD = settings.CONF_THRESHOLD
+IOU_THRESHOLD = settings.IOU_THRESHOLD
+MAX_DET = settings.MAX_DET
+HALF_PRECISION = settings.HALF_PRECISION
+VEHICLE_CLASS_IDS = tuple(settings.VEHICLE_CLASSES)
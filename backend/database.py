@@ -5,6 +5,9 @@ Handles saving and loading vehicle detection counts per camera.
 """
 import os
 import logging
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, Optional
 from dotenv import load_dotenv
@@ -23,35 +26,61 @@ DB_CONFIG = {
     "password": os.getenv("DB_PASSWORD", "postgres"),
 }
 
-_connection = None
+_pool = None
+_pool_lock = threading.Lock()
 
+# save_counts only enqueues; a background writer drains the queue in batches
+_WRITE_BATCH = 128
+_write_queue = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
 
+
+def get_pool():
+    """Get or create the thread-safe connection pool (singleton)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            return _pool
+        try:
+            from psycopg2.pool import ThreadedConnectionPool
+
+            _pool = ThreadedConnectionPool(1, 8, **DB_CONFIG)
+            logger.info(f"Connected to PostgreSQL database: {DB_CONFIG['database']}")
+            return _pool
+        except ImportError:
+            logger.error("psycopg2 not installed. Run: pip install psycopg2-binary")
+            return None
+        except Exception as e:
+            logger.error(f"Database connection failed: {e}")
+            logger.info("Counter persistence disabled. Counts will reset on restart.")
+            return None
+
+
+@contextmanager
 def get_connection():
-    """Get or create database connection (singleton)."""
-    global _connection
+    """Borrow a pooled connection (None when the database is unavailable)."""
+    pool = get_pool()
+    if pool is None:
+        yield None
+        return
+
+    conn = pool.getconn()
     try:
-        import psycopg2
-        
-        if _connection is None or _connection.closed:
-            _connection = psycopg2.connect(**DB_CONFIG)
-            logger.info(f"Connected to PostgreSQL database: {DB_CONFIG['database']}")
-        
-        return _connection
-    except ImportError:
-        logger.error("psycopg2 not installed. Run: pip install psycopg2-binary")
-        return None
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        logger.info("Counter persistence disabled. Counts will reset on restart.")
-        return None
+        yield conn
+    finally:
+        pool.putconn(conn, close=conn.closed != 0)
 
 
 def init_db():
     """Initialize database schema (create tables if not exist)."""
-    conn = get_connection()
-    if not conn:
-        return False
-    
+    with get_connection() as conn:
+        if not conn:
+            return False
+        return _init_schema(conn)
+
+
+def _init_schema(conn) -> bool:
     try:
         cursor = conn.cursor()
         
@@ -85,12 +114,15 @@ def init_db():
         
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
+        conn.rollback()
         return False
 
 
 def save_counts(camera_id: str, camera_name: str, counts: Dict[str, int]) -> bool:
     """
-    Save or update detection counts for a camera.
+    Queue detection counts for a camera to be saved in the background.
+    Never blocks on the database; the writer thread upserts queued rows in
+    batches.
     
     Args:
         camera_id: Unique camera identifier
@@ -98,47 +130,88 @@ def save_counts(camera_id: str, camera_name: str, counts: Dict[str, int]) -> boo
         counts: Dict with keys: car, motorcycle, bus, truck
     
     Returns:
-        True if successful, False otherwise
+        True (the row was queued)
     """
-    conn = get_connection()
-    if not conn:
-        return False
-    
-    try:
-        cursor = conn.cursor()
-        
-        # Upsert (INSERT ... ON CONFLICT UPDATE)
-        cursor.execute("""
-            INSERT INTO detection_counts 
-                (camera_id, camera_name, car_count, motorcycle_count, bus_count, truck_count, last_updated)
-            VALUES 
-                (%s, %s, %s, %s, %s, %s, NOW())
-            ON CONFLICT (camera_id) 
-            DO UPDATE SET
-                camera_name = EXCLUDED.camera_name,
-                car_count = EXCLUDED.car_count,
-                motorcycle_count = EXCLUDED.motorcycle_count,
-                bus_count = EXCLUDED.bus_count,
-                truck_count = EXCLUDED.truck_count,
-                last_updated = NOW();
-        """, (
-            camera_id,
-            camera_name,
-            counts.get("car", 0),
-            counts.get("motorcycle", 0),
-            counts.get("bus", 0),
-            counts.get("truck", 0),
-        ))
-        
-        conn.commit()
-        cursor.close()
-        logger.debug(f"Saved counts for camera {camera_id}: {counts}")
-        return True
+    _ensure_writer()
+    _write_queue.put_nowait((
+        camera_id,
+        camera_name,
+        counts.get("car", 0),
+        counts.get("motorcycle", 0),
+        counts.get("bus", 0),
+        counts.get("truck", 0),
+    ))
+    return True
+
+
+def _ensure_writer():
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+            _writer_thread.start()
+
+
+def _writer_loop():
+    """Drain queued rows (up to _WRITE_BATCH at a time) into one upsert."""
+    while True:
+        rows = [_write_queue.get()]
+        while len(rows) < _WRITE_BATCH:
+            try:
+                rows.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_rows(rows)
+        except Exception as e:
+            logger.error(f"Database writer error: {e}")
+        finally:
+            for _ in rows:
+                _write_queue.task_done()
+
+
+def _write_rows(rows: list) -> bool:
+    # One statement cannot upsert the same camera twice; keep its latest row
+    latest = list({row[0]: row for row in rows}.values())
+
+    with get_connection() as conn:
+        if not conn:
+            return False
         
-    except Exception as e:
-        logger.error(f"Failed to save counts for {camera_id}: {e}")
-        conn.rollback()
-        return False
+        try:
+            from psycopg2.extras import execute_values
+            
+            cursor = conn.cursor()
+            
+            # Upsert (INSERT ... ON CONFLICT UPDATE)
+            execute_values(cursor, """
+                INSERT INTO detection_counts 
+                    (camera_id, camera_name, car_count, motorcycle_count, bus_count, truck_count, last_updated)
+                VALUES %s
+                ON CONFLICT (camera_id) 
+                DO UPDATE SET
+                    camera_name = EXCLUDED.camera_name,
+                    car_count = EXCLUDED.car_count,
+                    motorcycle_count = EXCLUDED.motorcycle_count,
+                    bus_count = EXCLUDED.bus_count,
+                    truck_count = EXCLUDED.truck_count,
+                    last_updated = NOW();
+            """, latest, template="(%s, %s, %s, %s, %s, %s, NOW())")
+            
+            conn.commit()
+            cursor.close()
+            logger.debug(f"Saved counts for {len(latest)} camera(s)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to save counts for {[row[0] for row in latest]}: {e}")
+            conn.rollback()
+            return False
+
+
+def flush_counts():
+    """Block until every queued save has been written (or has failed)."""
+    _write_queue.join()
 
 
 def load_counts(camera_id: str) -> Optional[Dict[str, int]]:
@@ -151,10 +224,14 @@ def load_counts(camera_id: str) -> Optional[Dict[str, int]]:
     Returns:
         Dict with counts or None if not found
     """
-    conn = get_connection()
-    if not conn:
-        return None
-    
+    flush_counts()  # don't read back counts that are still queued
+    with get_connection() as conn:
+        if not conn:
+            return None
+        return _load_counts(conn, camera_id)
+
+
+def _load_counts(conn, camera_id: str) -> Optional[Dict[str, int]]:
     try:
         cursor = conn.cursor()
         
@@ -192,10 +269,14 @@ def get_all_counts() -> list:
     Returns:
         List of dicts with camera stats
     """
-    conn = get_connection()
-    if not conn:
-        return []
-    
+    flush_counts()
+    with get_connection() as conn:
+        if not conn:
+            return []
+        return _get_all_counts(conn)
+
+
+def _get_all_counts(conn) -> list:
     try:
         cursor = conn.cursor()
         
@@ -232,8 +313,11 @@ def get_all_counts() -> list:
 
 
 def close_connection():
-    """Close database connection."""
-    global _connection
-    if _connection and not _connection.closed:
-        _connection.close()
-        logger.info("Database connection closed")
+    """Flush pending saves and close all pooled database connections."""
+    global _pool
+    flush_counts()
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+            logger.info("Database connection closed")
+        _pool = None
@@ -10,11 +10,18 @@ Inference settings tuned for traffic CCTV:
   - half=True       (FP16 on CUDA)
 """
 import cv2
+import functools
 import numpy as np
+import os
+import re
 import torch
 import logging
+from itertools import repeat
+from types import MappingProxyType
 
-from core.config import settings
+from core.config import (
+    settings, CONF_THRESHOLD, IOU_THRESHOLD, IMGSZ, MAX_DET, HALF_PRECISION, VEHICLE_CLASS_IDS,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +43,13 @@ VEHICLE_COLORS = {
 _model = None
 _current_precision = None
 _device = None
+_use_half = False
+_predict_kwargs = MappingProxyType({})
+
+# Pinned host staging + device input for the CUDA upload path
+_pinned_in = None
+_gpu_in = None
+_copy_stream = None
 
 MODELS = {
     "low": "yolov10n.pt",
@@ -44,9 +58,51 @@ MODELS = {
 }
 
 
+def _engine_path(model_name: str, half: bool, int8: bool = False) -> str:
+    """TensorRT engine cache file, keyed by model, imgsz, precision and GPU."""
+    gpu = re.sub(r"[^A-Za-z0-9]+", "_", torch.cuda.get_device_name(0)).strip("_").lower()
+    dtype = "int8" if int8 else "fp16" if half else "fp32"
+    return f"{os.path.splitext(model_name)[0]}-{IMGSZ}-{dtype}-{gpu}.engine"
+
+
+def _load_tensorrt(model_name: str, half: bool):
+    """Load (exporting once if missing) the TensorRT engine for model_name; None on failure."""
+    from ultralytics import YOLO
+
+    engine_path = _engine_path(model_name, half)
+    try:
+        if not os.path.exists(engine_path):
+            logger.info(f"Exporting TensorRT engine: {engine_path}")
+            exported = YOLO(model_name).export(format="engine", half=half, imgsz=IMGSZ, device=0, workspace=2)
+            os.replace(exported, engine_path)
+        return YOLO(engine_path, task="detect")
+    except Exception as e:
+        logger.warning(f"TensorRT engine unavailable, using PyTorch weights: {e}")
+        return None
+
+
+def _build_predict_kwargs():
+    """Freeze the per-call predict/track kwargs for the current device and precision."""
+    return MappingProxyType({
+        "iou": IOU_THRESHOLD,
+        "imgsz": IMGSZ,
+        "max_det": MAX_DET,
+        "classes": list(VEHICLE_CLASS_IDS),
+        "verbose": False,
+        "device": _device,
+        # Only use half on CUDA with tensor cores
+        **({"half": True} if _use_half else {}),
+    })
+
+
 def load_model(precision: str = None):
-    """Load YOLOv10 model (singleton per precision). Applies FP16 on CUDA."""
-    global _model, _current_precision, _device
+    """
+    Load YOLOv10 model (singleton per precision). On CUDA a TensorRT engine
+    is exported once per precision/GPU and used in place of the .pt weights;
+    FP16 is applied on tensor-core GPUs. An INT8 engine built by
+    export_trt.py is preferred when present.
+    """
+    global _model, _current_precision, _device, _use_half, _predict_kwargs
 
     if precision is None:
         precision = settings.DEFAULT_PRECISION
@@ -61,22 +117,119 @@ def load_model(precision: str = None):
     model_name = MODELS[precision]
     logger.info(f"Loading YOLOv10: {model_name} ({precision})")
 
-    _model = YOLO(model_name)
     _current_precision = precision
 
     # Determine device
     if torch.cuda.is_available():
         _device = "cuda"
-        if settings.HALF_PRECISION:
+        # FP16 only pays off with tensor cores (SM 7.0+); Pascal runs it slower
+        major, minor = torch.cuda.get_device_capability()
+        _use_half = HALF_PRECISION and major >= 7
+        _predict_kwargs = _build_predict_kwargs()
+
+        # A calibrated INT8 engine (export_trt.py --int8) takes precedence
+        int8_path = _engine_path(model_name, _use_half, int8=True)
+        if os.path.exists(int8_path):
+            try:
+                _model = YOLO(int8_path, task="detect")
+                logger.info(f"TensorRT engine loaded (INT8): {int8_path}")
+                return _model
+            except Exception as e:
+                logger.warning(f"INT8 engine unusable, falling back: {e}")
+
+        _model = _load_tensorrt(model_name, _use_half)
+        if _model is not None:
+            logger.info(f"TensorRT engine loaded ({'FP16' if _use_half else 'FP32'})")
+            return _model
+
+        _model = YOLO(model_name)
+        if _use_half:
             _model.model.half()
             logger.info("FP16 half-precision enabled on CUDA")
+        else:
+            logger.info(f"FP16 disabled (compute capability {major}.{minor})")
+        # NHWC weights select tensor-core friendly convolution kernels
+        _model.model.to(memory_format=torch.channels_last)
     else:
+        _model = YOLO(model_name)
         _device = "cpu"
+        _use_half = False
+        _predict_kwargs = _build_predict_kwargs()
         logger.info("Running on CPU (FP16 disabled)")
 
     return _model
 
 
+def _stage_input(frame):
+    """
+    Letterbox frame into a pinned uint8 buffer and upload it on a side CUDA
+    stream. Returns (BCHW float tensor in [0, 1] on the GPU, scale).
+
+    Pinned memory lets the copy run as a true async DMA instead of the staged
+    pageable memcpy Ultralytics does for numpy input; only the 640x640 uint8
+    image crosses PCIe and normalisation happens on the device.
+    """
+    global _pinned_in, _gpu_in, _copy_stream
+
+    if _pinned_in is None:
+        _pinned_in = torch.empty((IMGSZ, IMGSZ, 3), dtype=torch.uint8, pin_memory=True)
+        _gpu_in = torch.empty((IMGSZ, IMGSZ, 3), dtype=torch.uint8, device="cuda")
+        _copy_stream = torch.cuda.Stream()
+
+    h, w = frame.shape[:2]
+    scale = min(IMGSZ / w, IMGSZ / h)
+    nw, nh = int(round(w * scale)), int(round(h * scale))
+
+    host = _pinned_in.numpy()
+    # Top-left placement: boxes map back with a plain divide by scale
+    host[nh:, :] = 114
+    host[:nh, nw:] = 114
+    cv2.resize(frame, (nw, nh), dst=host[:nh, :nw], interpolation=cv2.INTER_LINEAR)
+
+    with torch.cuda.stream(_copy_stream):
+        _gpu_in.copy_(_pinned_in, non_blocking=True)
+    torch.cuda.current_stream().wait_stream(_copy_stream)
+
+    dtype = torch.float16 if _use_half else torch.float32
+    # BGR HWC uint8 → RGB CHW float, the layout Ultralytics expects for tensors
+    tensor = _gpu_in.flip(-1).permute(2, 0, 1).unsqueeze(0).to(dtype).div_(255.0)
+    return tensor.contiguous(), scale
+
+
+def _extract_detections(b, scale: float, frame_shape, track: bool = False):
+    """Convert one image's Ultralytics Boxes into detection dicts in frame coordinates."""
+    if len(b) == 0:
+        return []
+    frame_h, frame_w = frame_shape[:2]
+
+    # One bulk device→host transfer per field instead of per-box scalar syncs
+    cls = b.cls.to(torch.int32).cpu().numpy()
+    conf = b.conf.cpu().numpy().astype(np.float64).round(3)
+    xyxy = b.xyxy
+    if scale != 1.0:
+        xyxy = xyxy / scale
+    xyxy = xyxy.to(torch.int32).cpu().numpy()
+    np.clip(xyxy[:, 0::2], 0, frame_w - 1, out=xyxy[:, 0::2])
+    np.clip(xyxy[:, 1::2], 0, frame_h - 1, out=xyxy[:, 1::2])
+    ids = b.id.to(torch.int32).cpu().numpy() if (track and b.id is not None) else None
+
+    # classes= already filters in-model; .get() doubles as the name lookup and
+    # only skips ids an overridden VEHICLE_CLASSES setting has no name for
+    track_ids = ids.tolist() if ids is not None else repeat(None)
+    return [
+        {
+            "class_name": name,
+            "confidence": cf,
+            "bbox": [x1, y1, x2, y2],
+            "x1": x1, "y1": y1,
+            "x2": x2, "y2": y2,
+            "track_id": tid,
+        }
+        for c, cf, (x1, y1, x2, y2), tid in zip(cls.tolist(), conf.tolist(), xyxy.tolist(), track_ids)
+        if (name := VEHICLE_CLASSES.get(c)) is not None
+    ]
+
+
 def detect_vehicles(frame, confidence: float = None, track: bool = False):
     """
     Run YOLO inference with optimized parameters.
@@ -84,59 +237,89 @@ def detect_vehicles(frame, confidence: float = None, track: bool = False):
     """
     model = load_model()
 
-    conf = confidence if confidence is not None else settings.CONF_THRESHOLD
-
-    # Common kwargs for both detect and track modes
-    kwargs = dict(
-        conf=conf,
-        iou=settings.IOU_THRESHOLD,
-        imgsz=settings.IMGSZ,
-        max_det=settings.MAX_DET,
-        classes=settings.VEHICLE_CLASSES,
-        verbose=False,
-        device=_device,
-    )
-
-    # Only use half on CUDA
-    if _device == "cuda" and settings.HALF_PRECISION:
-        kwargs["half"] = True
-
-    if track:
-        kwargs["persist"] = True
-        results = model.track(frame, **kwargs)
-    else:
-        results = model(frame, **kwargs)
-
-    detections = []
-    for result in results:
-        for box in result.boxes:
-            class_id = int(box.cls[0])
-            if class_id not in VEHICLE_CLASSES:
-                continue
-
-            conf_val = float(box.conf[0])
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
+    conf = confidence if confidence is not None else CONF_THRESHOLD
 
-            detection = {
-                "class_name": VEHICLE_CLASSES[class_id],
-                "confidence": round(conf_val, 3),
-                "bbox": [x1, y1, x2, y2],
-                "x1": x1, "y1": y1,
-                "x2": x2, "y2": y2
-            }
+    scale = 1.0
+    source = frame
 
-            if track and hasattr(box, 'id') and box.id is not None:
-                detection["track_id"] = int(box.id[0])
+    with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16, enabled=_use_half):
+        if _device == "cuda":
+            # Tensor input skips Ultralytics' preprocess; boxes come back in letterbox space
+            source, scale = _stage_input(frame)
+        if track:
+            results = model.track(source, conf=conf, persist=True, **_predict_kwargs)
+        else:
+            results = model(source, conf=conf, **_predict_kwargs)
 
-            detections.append(detection)
+    return _extract_detections(results[0].boxes, scale, frame.shape, track)
 
-    return detections
 
-
-def draw_boxes(frame, detections, tracking_data=None, show_timestamp: bool = False):
-    """Draw styled bounding boxes with tracking overlays."""
+def _box_polylines(boxes, cl: int = 15):
+    """
+    Build the (N, 4, 2) closed box outlines and (N*4, 3, 2) L-shaped corner
+    accents for an (N, 4) xyxy int array.
+    """
+    x1, y1, x2, y2 = boxes.T
+    rects = np.stack([x1, y1, x2, y1, x2, y2, x1, y2], axis=1).reshape(-1, 4, 2)
+    corners = np.stack([
+        np.stack([x1 + cl, y1, x1, y1, x1, y1 + cl], axis=1),
+        np.stack([x2 - cl, y1, x2, y1, x2, y1 + cl], axis=1),
+        np.stack([x1 + cl, y2, x1, y2, x1, y2 - cl], axis=1),
+        np.stack([x2 - cl, y2, x2, y2, x2, y2 - cl], axis=1),
+    ], axis=1).reshape(-1, 3, 2)
+    return rects.astype(np.int32), corners.astype(np.int32)
+
+
+# Reused annotation buffer (reallocated only when the frame size changes)
+_annotated_buf = None
+
+@functools.lru_cache(maxsize=1024)
+def _text_size(label: str):
+    """Cached cv2.getTextSize for the label font; returns (width, height)."""
+    return cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
+
+
+# Static HUD chrome (title + precision status), rebuilt only when precision changes
+_HUD_CACHE = {"precision": None, "img": None, "mask": None}
+
+
+def _hud_layer(prec: str):
+    """Return (sprite, mask) of the static HUD text for the annotated[5:111, 5:221] ROI."""
+    if _HUD_CACHE["precision"] != prec:
+        img = np.zeros((106, 216, 3), dtype=np.uint8)
+        cv2.putText(img, "VMS ACCURACY MONITOR", (10, 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+        status_color = {
+            "high": (0, 255, 0), "medium": (0, 255, 255), "low": (100, 100, 255)
+        }.get(prec, (180, 180, 180))
+        cv2.putText(img, f"Status: {prec.upper()} PRECISION", (10, 90),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, status_color, 1)
+        # LINE_8 text has no anti-aliasing, so a binary mask reproduces it exactly
+        _HUD_CACHE.update(precision=prec, img=img, mask=img.any(axis=2, keepdims=True))
+    return _HUD_CACHE["img"], _HUD_CACHE["mask"]
+
+
+def draw_boxes(frame, detections, tracking_data=None, show_timestamp: bool = False,
+               max_width: int = None):
+    """
+    Draw styled bounding boxes with tracking overlays.
+    Frames wider than max_width are downscaled first (straight into the
+    annotation buffer) and the overlays drawn at that size, so drawing and
+    the later JPEG encode both work on the smaller image.
+    Returns a shared buffer that is overwritten by the next call.
+    """
     from datetime import datetime
-    annotated = frame.copy()
+    global _annotated_buf
+    h, w = frame.shape[:2]
+    scale = max_width / w if max_width and w > max_width else 1.0
+    out_shape = (int(h * scale), int(w * scale)) + frame.shape[2:] if scale != 1.0 else frame.shape
+    if _annotated_buf is None or _annotated_buf.shape != out_shape or _annotated_buf.dtype != frame.dtype:
+        _annotated_buf = np.empty(out_shape, dtype=frame.dtype)
+    annotated = _annotated_buf
+    if scale != 1.0:
+        cv2.resize(frame, (out_shape[1], out_shape[0]), dst=annotated, interpolation=cv2.INTER_AREA)
+    else:
+        np.copyto(annotated, frame)
 
     # Build tracking lookup
     tracking_lookup = {}
@@ -145,12 +328,14 @@ def draw_boxes(frame, detections, tracking_data=None, show_timestamp: bool = Fal
             tracking_lookup[track["track_id"]] = track
 
     # ── Stats HUD (top-left) ──
-    overlay = annotated.copy()
-    cv2.rectangle(overlay, (5, 5), (220, 110), (0, 0, 0), -1)
-    cv2.addWeighted(overlay, 0.5, annotated, 0.5, 0, annotated)
+    # 50% black blend of just the HUD box (halving the ROI in place)
+    hud = annotated[5:111, 5:221]
+    np.right_shift(hud, 1, out=hud)
 
-    cv2.putText(annotated, "VMS ACCURACY MONITOR", (15, 25),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+    sprite, mask = _hud_layer(_current_precision or "unknown")
+    # The ROI is clipped on frames smaller than the HUD; crop the sprite to match
+    h, w = hud.shape[:2]
+    np.copyto(hud, sprite[:h, :w], where=mask[:h, :w])
 
     active = len(tracking_data) if tracking_data else 0
     cv2.putText(annotated, f"Active Tracks: {active}", (15, 50),
@@ -158,31 +343,24 @@ def draw_boxes(frame, detections, tracking_data=None, show_timestamp: bool = Fal
     cv2.putText(annotated, f"Detections: {len(detections)}", (15, 70),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
-    prec = _current_precision or "unknown"
-    status_color = {
-        "high": (0, 255, 0), "medium": (0, 255, 255), "low": (100, 100, 255)
-    }.get(prec, (180, 180, 180))
-    cv2.putText(annotated, f"Status: {prec.upper()} PRECISION", (15, 95),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.4, status_color, 1)
+    # ── Boxes + corner accents: two polylines calls per class color ──
+    boxes_by_class = {}
+    for det in detections:
+        boxes_by_class.setdefault(det["class_name"], []).append(det["bbox"])
+    for cls, boxes in boxes_by_class.items():
+        color = VEHICLE_COLORS.get(cls, (255, 255, 255))
+        rects, corners = _box_polylines((np.array(boxes) * scale).astype(np.int32))
+        cv2.polylines(annotated, rects, True, color, 2)
+        cv2.polylines(annotated, corners, False, color, 3)
 
-    # ── Draw each detection ──
+    # ── Per-detection labels and tracking overlays ──
     for det in detections:
         cls = det["class_name"]
         conf = det["confidence"]
-        x1, y1, x2, y2 = det["x1"], det["y1"], det["x2"], det["y2"]
+        x1, y1 = int(det["x1"] * scale), int(det["y1"] * scale)
         color = VEHICLE_COLORS.get(cls, (255, 255, 255))
         track_id = det.get("track_id")
 
-        # Box + corner accents
-        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-        cl = 15
-        for (px, py, dx, dy) in [
-            (x1, y1, 1, 1), (x2, y1, -1, 1),
-            (x1, y2, 1, -1), (x2, y2, -1, -1)
-        ]:
-            cv2.line(annotated, (px, py), (px + cl * dx, py), color, 3)
-            cv2.line(annotated, (px, py), (px, py + cl * dy), color, 3)
-
         # Label
         label = f"{cls.upper()} {conf:.0%}"
 
@@ -192,18 +370,18 @@ def draw_boxes(frame, detections, tracking_data=None, show_timestamp: bool = Fal
             direction = track.get("direction", "")
             age = track.get("frames_tracked", 0)
             centroid = track.get("centroid", [0, 0])
-            cx, cy = int(centroid[0]), int(centroid[1])
+            cx, cy = int(centroid[0] * scale), int(centroid[1] * scale)
 
             # Centroid dot
             cv2.circle(annotated, (cx, cy), 4, color, -1)
             cv2.circle(annotated, (cx, cy), 6, (255, 255, 255), 1)
 
             # Velocity arrow
-            trajectory = track.get("trajectory", [])
+            trajectory = track.get("trajectory", ())
             if len(trajectory) > 2:
                 p1, p2 = trajectory[-2], trajectory[-1]
-                v_dx = int((p2[0] - p1[0]) * 5)
-                v_dy = int((p2[1] - p1[1]) * 5)
+                v_dx = int((p2[0] - p1[0]) * 5 * scale)
+                v_dy = int((p2[1] - p1[1]) * 5 * scale)
                 cv2.arrowedLine(annotated, (cx, cy), (cx + v_dx, cy + v_dy),
                                 (255, 255, 255), 2, tipLength=0.3)
 
@@ -216,16 +394,17 @@ def draw_boxes(frame, detections, tracking_data=None, show_timestamp: bool = Fal
                         cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
 
         # Label background
-        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+        tw, th = _text_size(label)
         cv2.rectangle(annotated, (x1, y1 - th - 10), (x1 + tw + 10, y1), color, -1)
         cv2.putText(annotated, label, (x1 + 5, y1 - 5),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
 
         # Trajectory trail
         if track_id and track_id in tracking_lookup:
-            trajectory = tracking_lookup[track_id].get("trajectory", [])
+            trajectory = tracking_lookup[track_id].get("trajectory", ())
             if len(trajectory) > 1:
-                points = np.array(trajectory, dtype=np.int32)
+                # Tracker hands out an int32 view; only a downscale needs a new array
+                points = trajectory if scale == 1.0 else (trajectory * scale).astype(np.int32)
                 cv2.polylines(annotated, [points], False, color, 1)
 
     # ── Timestamp overlay ──
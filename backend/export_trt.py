@@ -0,0 +1,67 @@
+"""
+export_trt.py — TensorRT Engine Export for the Backend Models
+
+Builds the engine files detection.load_model looks for, ahead of time
+instead of on first start. FP16/FP32 engines need no data; INT8 engines
+are calibrated on frames sampled from representative traffic videos.
+
+Usage:
+    python export_trt.py --precision low
+    python export_trt.py --precision low --int8 --video cam1.mp4 [--video cam2.mp4 ...]
+
+Engines are GPU-architecture specific, so run this on the deployment machine.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import torch
+from ultralytics import YOLO
+
+# Calibration helpers are shared with the root export_engine.py
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from calibration import extract_frames, write_dataset_yaml
+from core.config import settings, IMGSZ, HALF_PRECISION
+from detection import MODELS, _engine_path
+
+CALIB_DIR = "calib"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a backend YOLOv10 model to a TensorRT engine")
+    parser.add_argument("--precision", choices=list(MODELS), default=settings.DEFAULT_PRECISION,
+                        help="Model size to export (low/medium/high)")
+    parser.add_argument("--int8", action="store_true", help="Build a calibrated INT8 engine")
+    parser.add_argument("--video", action="append", default=[], help="Calibration video for --int8 (repeatable)")
+    parser.add_argument("--calib-dir", default=CALIB_DIR, help="Where calibration images are written")
+    parser.add_argument("--frames", type=int, default=500, help="Number of calibration frames")
+    args = parser.parse_args()
+
+    if not torch.cuda.is_available():
+        parser.error("TensorRT export needs a CUDA GPU")
+    if args.int8 and not args.video:
+        parser.error("--int8 needs at least one --video for calibration")
+
+    model_name = MODELS[args.precision]
+    major, _ = torch.cuda.get_device_capability()
+    half = HALF_PRECISION and major >= 7
+    export_args = dict(format="engine", imgsz=IMGSZ, device=0, workspace=4)
+    model = YOLO(model_name)
+
+    if args.int8:
+        count = extract_frames(args.video, os.path.join(args.calib_dir, "images"), args.frames)
+        print(f"Extracted {count} calibration frames to {args.calib_dir}")
+        export_args.update(int8=True, data=write_dataset_yaml(args.calib_dir, model.names))
+    else:
+        export_args.update(half=half)
+
+    exported = model.export(**export_args)
+    engine_path = _engine_path(model_name, half, int8=args.int8)
+    os.replace(exported, engine_path)
+    print(f"Saved {'INT8' if args.int8 else 'FP16' if half else 'FP32'} engine to {engine_path}")
+
+
+if __name__ == "__main__":
+    main()
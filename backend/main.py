@@ -1,41 +1,60 @@
 """
 main.py — Production Entry Point
 
-Broadcast loop consumes frames from engine at BROADCAST_FPS rate.
+Broadcast loop sends each payload as soon as the engine publishes it.
 Engine runs detection independently at INFER_FPS rate.
 """
 import asyncio
-import json
 import logging
+import time
 import uvicorn
 from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 from core.config import settings
-from services.websocket import manager
+from services.websocket import manager, loads_json, ORJSON_AVAILABLE
 from services.engine import engine
-from database import init_db
+from database import init_db, close_connection
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("main")
 
+# libuv event loop (ships with uvicorn[standard] on Linux/macOS; absent on Windows)
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
 
 # ── Broadcast Loop ─────────────────────────────────
 
 async def broadcast_loop():
-    """Consume latest frame from engine and broadcast to all clients."""
+    """
+    Wait for the engine to publish a payload, then broadcast it to all clients.
+    BROADCAST_FPS is only a ceiling: a payload published sooner waits out the
+    remainder of the interval, and whatever is newest by then is sent.
+    """
+    event = engine.new_data_event
     interval = 1.0 / settings.BROADCAST_FPS
-    logger.info(f"Broadcast loop started (target {settings.BROADCAST_FPS} FPS)")
+    last_send = 0.0
+    logger.info(f"Broadcast loop started (event-driven, max {settings.BROADCAST_FPS} FPS)")
 
     while True:
         try:
+            await event.wait()
+            event.clear()
+            wait = last_send + interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
             data = engine.get_broadcast_data()
             if data and manager.clients:
                 await manager.broadcast(data)
-            await asyncio.sleep(interval)
+            last_send = time.monotonic()
         except asyncio.CancelledError:
             break
         except Exception as e:
@@ -49,20 +68,26 @@ async def broadcast_loop():
 async def lifespan(app: FastAPI):
     logger.info("Starting up...")
     init_db()
+    engine.attach_loop(asyncio.get_running_loop())
     task = asyncio.create_task(broadcast_loop())
     yield
     logger.info("Shutting down...")
     task.cancel()
     engine.stop_processing()
+    close_connection()
     try:
         await task
     except asyncio.CancelledError:
         pass
 
+# orjson-backed REST responses when it's installed (same switch as the WebSocket path)
+ResponseClass = ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
+
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ResponseClass,
 )
 
 app.add_middleware(
@@ -90,15 +115,15 @@ async def health():
 async def get_presets():
     preset_path = Path(__file__).parent / "camera_presets.json"
     if preset_path.exists():
-        with open(preset_path, "r") as f:
-            return json.load(f)
+        with open(preset_path, "rb") as f:
+            return loads_json(f.read())
     return {"cameras": []}
 
 @app.get("/api/stats")
 async def get_stats():
     return {
         "counts": engine.stats["counts"],
-        "timeline": engine.stats["timeline"][-20:],
+        "timeline": list(engine.stats["timeline"])[-20:],
         "is_running": engine.is_running,
         "source_type": engine.stats["source_type"],
         "fps": round(engine.actual_fps, 1),
@@ -114,7 +139,7 @@ async def stop_processing():
 async def start_rtsp(url: str = Form(...), camera_id: str = Form(None), camera_name: str = Form(None)):
     result = engine.set_source_rtsp(url, camera_id, camera_name)
     if not result["success"]:
-        return JSONResponse(status_code=400, content=result)
+        return ResponseClass(status_code=400, content=result)
     return {"status": "started", "source": "rtsp", "details": result}
 
 @app.post("/api/start/file")
@@ -129,14 +154,14 @@ async def start_file(video: UploadFile = File(...)):
 
     result = engine.set_source_file(tmp_path)
     if not result["success"]:
-        return JSONResponse(status_code=400, content=result)
+        return ResponseClass(status_code=400, content=result)
     return {"status": "started", "source": "file", "details": result}
 
 @app.post("/api/start/webcam")
 async def start_webcam(index: int = Form(0)):
     result = engine.set_source_webcam(index)
     if not result["success"]:
-        return JSONResponse(status_code=400, content=result)
+        return ResponseClass(status_code=400, content=result)
     return {"status": "started", "source": "webcam", "details": result}
 
 
@@ -147,7 +172,7 @@ async def video_websocket(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
-            data = await websocket.receive_json()
+            data = loads_json(await websocket.receive_text())
             if "confidence" in data:
                 pass  # Future: dynamic config updates
     except WebSocketDisconnect:
@@ -159,4 +184,5 @@ async def video_websocket(websocket: WebSocket):
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host=settings.HOST, port=settings.PORT,
-                log_level="info", reload=settings.DEBUG)
+                log_level="info", reload=settings.DEBUG,
+                loop="uvloop" if UVLOOP_AVAILABLE else "asyncio")
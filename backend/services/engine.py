@@ -5,33 +5,74 @@ Pipeline:
   StreamManager (grab thread) → latest_raw_frame
       ↓
   _process_loop (detection thread):
-      1. Read frame (skip if already processed)
+      1. Take the newest frame (files: every Nth, decoded on demand)
       2. YOLO inference (adaptive FPS)
       3. Tracker update
-      4. Annotate + JPEG encode at reduced resolution
-      5. Store in latest_broadcast_data
+      4. Annotate at reduced resolution (skipped while no WebSocket client
+         is connected) and hand off to the encoder thread
+      ↓
+  _encode_loop (encoder thread):
+      5. JPEG encode (raw bytes, no base64), store in the broadcast slot
       ↓
   broadcast_loop (async, main.py):
-      Read latest_broadcast_data → send to all WS clients
+      Woken by _publish → take the broadcast slot → send to all WS clients
 """
+import asyncio
+import os
 import time
 import cv2
-import base64
+import queue
 import threading
 import logging
 import sys
+import torch
+from collections import deque
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from stream_manager import StreamManager
+from stream_manager import StreamManager, pin_current_thread
 from detection import load_model, detect_vehicles, draw_boxes
 from tracker import VehicleTracker
 from database import save_counts, load_counts
 from core.config import settings
+from services.websocket import manager
 
 logger = logging.getLogger(__name__)
 
+# Counted track ids kept for de-duplication. Tracker ids increase
+# monotonically, so once the set reaches twice this size only the newest
+# SEEN_IDS_WINDOW ids are kept.
+SEEN_IDS_WINDOW = 5000
+
+# File sources: extra frames skipped when the loop can't hold INFER_FPS.
+# Raised while the smoothed loop time is over budget, lowered after
+# SKIP_CALM_FRAMES consecutive frames under SKIP_CALM_RATIO of the budget.
+MAX_EXTRA_SKIP = 8
+SKIP_CALM_FRAMES = 30
+SKIP_CALM_RATIO = 0.6
+
+# CPU pinning layout: inference thread on cores 0-1, capture thread on core 2,
+# everything else (asyncio loop, encoder) floats over the rest
+INFER_CORES = {0, 1}
+CAPTURE_CORES = {2}
+
+# SIMD libjpeg-turbo encoder when PyTurboJPEG and the native library are
+# present; otherwise cv2.imencode
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _turbojpeg = TurboJPEG()
+except Exception:
+    _turbojpeg = None
+
+
+def encode_jpeg(image, quality: int) -> bytes:
+    """JPEG-encode a BGR frame (sent as-is in a binary WebSocket message)."""
+    if _turbojpeg is not None:
+        return _turbojpeg.encode(image, quality=quality, pixel_format=TJPF_BGR)
+    _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
 
 class DetectionEngine:
     """
@@ -53,6 +94,7 @@ class DetectionEngine:
             return
 
         self.stream_mgr = StreamManager()
+        self._infer_cores = self._pinning_layout()
         self.tracker = None
         self.is_running = False
         self.thread = None
@@ -62,7 +104,7 @@ class DetectionEngine:
         self.stats = {
             "counts": {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0},
             "seen_ids": set(),
-            "timeline": [],
+            "timeline": deque(maxlen=100),
             "frame_count": 0,
             "source_type": None,
             "tracking_enabled": True,
@@ -71,11 +113,19 @@ class DetectionEngine:
             "current_camera_name": None
         }
 
-        # Broadcast data — read by main.py broadcast_loop
-        self.latest_broadcast_data = None
-        self._broadcast_lock = threading.Lock()
+        # Broadcast data — read by main.py broadcast_loop. A one-slot deque:
+        # append (newest replaces pending) and popleft are each atomic in C,
+        # so producers and the consumer need no lock
+        self._broadcast_slot = deque(maxlen=1)
+        # Set (thread-safely, on the server's event loop) whenever a payload is published
+        self._loop = None
+        self.new_data_event = None
         self._broadcast_seq = 0  # Sequence number for frame/meta separation
 
+        # Annotated frame → encoder thread; one slot, newest wins
+        self._encode_q = queue.Queue(maxsize=1)
+        self._encoder_thread = None
+
         # Performance metrics
         self.actual_fps = 0.0
         self.infer_time_ms = 0.0
@@ -88,6 +138,19 @@ class DetectionEngine:
         except Exception as e:
             logger.error(f"Failed to load initial model: {e}")
 
+    def _pinning_layout(self):
+        """
+        Cores for the inference thread, or None when pinning doesn't apply.
+        Only with CUDA: on CPU inference the thread's affinity would also
+        confine torch's worker pool to two cores.
+        """
+        if not settings.CPU_PINNING or not hasattr(os, "sched_getaffinity"):
+            return None
+        if len(os.sched_getaffinity(0)) < 4 or not torch.cuda.is_available():
+            return None
+        self.stream_mgr.cpu_cores = CAPTURE_CORES
+        return INFER_CORES
+
     # ── Lifecycle ──────────────────────────────────────
 
     def start_processing(self):
@@ -97,6 +160,8 @@ class DetectionEngine:
         self.stop_event.clear()
         self.thread = threading.Thread(target=self._process_loop, daemon=True)
         self.thread.start()
+        self._encoder_thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self._encoder_thread.start()
         logger.info("Detection Engine started.")
 
     def stop_processing(self):
@@ -104,6 +169,9 @@ class DetectionEngine:
         self.stop_event.set()
         if self.thread:
             self.thread.join(timeout=3.0)
+        if self._encoder_thread:
+            self._encoder_thread.join(timeout=1.0)
+            self._encoder_thread = None
         self.stream_mgr.stop()
 
         # Save final counts
@@ -121,16 +189,19 @@ class DetectionEngine:
         """Adaptive-FPS detection loop with frame skipping."""
         target_interval = 1.0 / settings.INFER_FPS
         resize_w = settings.FRAME_RESIZE_WIDTH
-        jpeg_quality = settings.JPEG_QUALITY
         db_interval = settings.DB_SAVE_INTERVAL
         meta_every = settings.META_EVERY_N
 
         if self.tracker is None:
             self.tracker = VehicleTracker()
 
+        if pin_current_thread(self._infer_cores):
+            logger.info(f"Inference thread pinned to cores {sorted(self._infer_cores)}")
+
         fps_counter = 0
         fps_timer = time.time()
-        last_frame_id = None
+        loop_ema = 0.0
+        calm_frames = 0
 
         while not self.stop_event.is_set():
             loop_start = time.time()
@@ -140,21 +211,14 @@ class DetectionEngine:
                 continue
 
             # ── 1. Read Frame ──
-            ret, frame = self.stream_mgr.read_frame()
+            # Popped from the reader's slot, so a frame is never processed twice.
+            # The array is the reader's reused buffer: valid until the next read
+            ret, frame = self.stream_mgr.read_frame(timeout=0.05)
             if not ret or frame is None:
-                if self.stats["source_type"] == "file":
+                if self.stats["source_type"] == "file" and self.stream_mgr.eof:
                     self._handle_file_end()
                     time.sleep(0.5)
-                else:
-                    time.sleep(0.01)
-                continue
-
-            # Frame skip: don't re-process the exact same frame object
-            frame_id = id(frame)
-            if frame_id == last_frame_id:
-                time.sleep(0.005)
                 continue
-            last_frame_id = frame_id
 
             self.stats["frame_count"] += 1
 
@@ -182,8 +246,6 @@ class DetectionEngine:
             # ── 4. Timeline ──
             frame_vehicles = len(detections)
             self.stats["timeline"].append(frame_vehicles)
-            if len(self.stats["timeline"]) > 100:
-                self.stats["timeline"].pop(0)
 
             # ── 5. DB auto-save ──
             if self.stats["current_camera_id"] and self.stats["frame_count"] % db_interval == 0:
@@ -193,24 +255,19 @@ class DetectionEngine:
                     self.stats["counts"]
                 )
 
-            # ── 6. Annotate + Encode ──
-            annotated = draw_boxes(frame, detections, tracking_data, show_timestamp=True)
-
-            # Resize for bandwidth
-            h, w = annotated.shape[:2]
-            if w > resize_w:
-                scale = resize_w / w
-                new_h = int(h * scale)
-                annotated = cv2.resize(annotated, (resize_w, new_h), interpolation=cv2.INTER_AREA)
-
-            _, buffer = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
-            frame_b64 = base64.b64encode(buffer).decode('utf-8')
+            # ── 6. Annotate ──
+            # Nobody to show it to: counting continues, drawing and encoding don't
+            annotated = None
+            if manager.clients:
+                # Downscaled to FRAME_RESIZE_WIDTH before drawing (bandwidth + encode cost);
+                # copied out of draw_boxes' shared buffer for the encoder thread
+                annotated = draw_boxes(frame, detections, tracking_data, show_timestamp=True,
+                                       max_width=resize_w).copy()
 
             # ── 7. Build Broadcast Payload ──
             self._broadcast_seq += 1
 
             payload = {
-                "frame": frame_b64,
                 "is_running": True,
                 "seq": self._broadcast_seq,
             }
@@ -218,7 +275,7 @@ class DetectionEngine:
             # Include metadata every Nth frame (saves bandwidth)
             if self._broadcast_seq % meta_every == 0:
                 payload["counts"] = self.stats["counts"]
-                payload["timeline"] = self.stats["timeline"]
+                payload["timeline"] = list(self.stats["timeline"])
                 payload["frame_count"] = self.stats["frame_count"]
                 payload["total_detected"] = sum(self.stats["counts"].values())
                 payload["tracking_stats"] = tracking_stats
@@ -228,8 +285,19 @@ class DetectionEngine:
                     "infer_ms": round(self.infer_time_ms, 1),
                 }
 
-            with self._broadcast_lock:
-                self.latest_broadcast_data = payload
+            if annotated is not None:
+                # Encoder adds the JPEG and publishes; a stale pending frame is dropped
+                item = (annotated, payload)
+                try:
+                    self._encode_q.put_nowait(item)
+                except queue.Full:
+                    try:
+                        self._encode_q.get_nowait()
+                    except queue.Empty:
+                        pass
+                    self._encode_q.put_nowait(item)
+            else:
+                self._publish(payload)
 
             # ── 8. FPS calculation ──
             fps_counter += 1
@@ -241,6 +309,24 @@ class DetectionEngine:
 
             # ── 9. Adaptive throttle ──
             elapsed = time.time() - loop_start
+            loop_ema = elapsed if loop_ema == 0.0 else 0.8 * loop_ema + 0.2 * elapsed
+
+            # Files: trade decoded frames for pace instead of falling behind
+            # (live sources already drop stale frames in the reader)
+            if self.stats["source_type"] == "file":
+                skip = self.stream_mgr.extra_skip
+                if loop_ema > target_interval:
+                    calm_frames = 0
+                    skip = min(MAX_EXTRA_SKIP, skip + 1)
+                elif loop_ema < SKIP_CALM_RATIO * target_interval:
+                    calm_frames += 1
+                    if calm_frames >= SKIP_CALM_FRAMES:
+                        calm_frames = 0
+                        skip = max(0, skip - 1)
+                else:
+                    calm_frames = 0
+                self.stream_mgr.extra_skip = skip
+
             wait = target_interval - elapsed
             if wait > 0:
                 time.sleep(wait)
@@ -250,38 +336,80 @@ class DetectionEngine:
                 if elapsed > target_interval * 1.5:
                     logger.debug(f"Frame over budget: {elapsed*1000:.0f}ms (target {target_interval*1000:.0f}ms)")
 
+    def _encode_loop(self):
+        """JPEG-encode annotated frames off the inference thread and publish them."""
+        jpeg_quality = settings.JPEG_QUALITY
+
+        while not self.stop_event.is_set():
+            try:
+                annotated, payload = self._encode_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            payload["frame"] = encode_jpeg(annotated, jpeg_quality)
+            if not self.is_running:
+                continue  # Don't overwrite a stop/complete status
+            self._publish(payload)
+
+        # Drop anything left for the next session
+        try:
+            self._encode_q.get_nowait()
+        except queue.Empty:
+            pass
+
+    def attach_loop(self, loop):
+        """Bind to the server's event loop so _publish can wake broadcast_loop."""
+        self._loop = loop
+        self.new_data_event = asyncio.Event()
+
+    def _publish(self, payload: dict):
+        """Store the latest broadcast payload and wake broadcast_loop."""
+        self._broadcast_slot.append(payload)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.new_data_event.set)
+
     def get_broadcast_data(self):
-        """Thread-safe read of latest broadcast payload."""
-        with self._broadcast_lock:
-            data = self.latest_broadcast_data
-            self.latest_broadcast_data = None  # Consume it
-            return data
+        """Thread-safe take of the latest broadcast payload (None if nothing new)."""
+        try:
+            return self._broadcast_slot.popleft()
+        except IndexError:
+            return None
 
     # ── Helpers ─────────────────────────────────────────
 
     def _update_counts(self, detections):
-        for det in detections:
-            cls = det["class_name"]
-            track_id = det.get("track_id")
-            if track_id is not None and track_id not in self.stats["seen_ids"]:
-                self.stats["seen_ids"].add(track_id)
-                self.stats["counts"][cls] = self.stats["counts"].get(cls, 0) + 1
+        """Count each track id once, using one set difference per frame."""
+        frame_pairs = [(d["track_id"], d["class_name"]) for d in detections if d.get("track_id") is not None]
+        if not frame_pairs:
+            return
+
+        seen = self.stats["seen_ids"]
+        new_ids = {tid for tid, _ in frame_pairs} - seen
+        if not new_ids:
+            return
+
+        counts = self.stats["counts"]
+        for tid, cls in frame_pairs:
+            if tid in new_ids:
+                counts[cls] = counts.get(cls, 0) + 1
+        seen |= new_ids
+
+        if len(seen) > 2 * SEEN_IDS_WINDOW:
+            self.stats["seen_ids"] = set(sorted(seen)[-SEEN_IDS_WINDOW:])
 
     def _handle_file_end(self):
         self.is_running = False
-        with self._broadcast_lock:
-            self.latest_broadcast_data = {
-                "status": "complete",
-                "counts": self.stats["counts"],
-                "total_detected": sum(self.stats["counts"].values())
-            }
+        self._publish({
+            "status": "complete",
+            "counts": self.stats["counts"],
+            "total_detected": sum(self.stats["counts"].values())
+        })
         self.stream_mgr.stop()
 
     # ── Source Control ──────────────────────────────────
 
     def set_source_file(self, path):
         self.stop_processing()
-        res = self.stream_mgr.open_file(path)
+        res = self.stream_mgr.open_file(path, target_fps=settings.INFER_FPS)
         if res["success"]:
             self._reset_stats()
             self.stats["source_type"] = "file"
@@ -305,7 +433,10 @@ class DetectionEngine:
 
     def set_source_webcam(self, index):
         self.stop_processing()
-        res = self.stream_mgr.open_webcam(index)
+        # Capture at the display width: nothing downstream needs more pixels
+        width = settings.FRAME_RESIZE_WIDTH
+        res = self.stream_mgr.open_webcam(index, width=width, height=width * 9 // 16,
+                                          fps=settings.INFER_FPS * 2)
         if res["success"]:
             self._reset_stats()
             self.stats["source_type"] = "webcam"
@@ -316,7 +447,7 @@ class DetectionEngine:
         self.stats.update({
             "counts": {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0},
             "seen_ids": set(),
-            "timeline": [],
+            "timeline": deque(maxlen=100),
             "frame_count": 0
         })
         self.tracker = VehicleTracker()
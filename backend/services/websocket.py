@@ -4,8 +4,12 @@ websocket.py — WebSocket Connection Manager with Backpressure Handling
 Each client has a 'ready' flag. If a client hasn't finished receiving
 the previous frame, we skip it for this broadcast cycle.
 This prevents queue buildup on slow clients without blocking fast ones.
+
+Wire protocol: a message's JPEG frame (if any) goes out as a binary
+WebSocket message, followed by the remaining fields as a JSON text message.
 """
 import asyncio
+import json
 import logging
 import time
 from typing import List, Dict
@@ -13,14 +17,35 @@ from fastapi import WebSocket
 
 logger = logging.getLogger(__name__)
 
+# A send stalled this long means a dead or hopeless client. A cancelled send
+# can leave a half-written frame, so such clients are dropped, not retried.
+SEND_TIMEOUT = 2.0
+
+# Optional orjson: SIMD JSON encode/decode (falls back to stdlib json)
+try:
+    import orjson
+
+    def dumps_json(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    loads_json = orjson.loads
+    ORJSON_AVAILABLE = True
+except ImportError:
+    def dumps_json(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+    loads_json = json.loads
+    ORJSON_AVAILABLE = False
+
 
 class ClientState:
     """Per-client connection state."""
-    __slots__ = ('ws', 'ready', 'last_send_time', 'frames_sent', 'frames_dropped')
+    __slots__ = ('ws', 'ready', 'dead', 'last_send_time', 'frames_sent', 'frames_dropped')
 
     def __init__(self, ws: WebSocket):
         self.ws = ws
         self.ready = True
+        self.dead = False
         self.last_send_time = 0.0
         self.frames_sent = 0
         self.frames_dropped = 0
@@ -59,26 +84,42 @@ class ConnectionManager:
         if not self.clients:
             return
 
+        # Split and serialise once for all clients: raw JPEG bytes + JSON text
+        frame = message.get("frame")
+        meta = {k: v for k, v in message.items() if k != "frame"} if frame is not None else message
+        meta = dumps_json(meta)
+
         tasks = []
         for cid, client in list(self.clients.items()):
             if client.ready:
-                tasks.append(self._send_with_backpressure(cid, client, message))
+                tasks.append(self._send_with_backpressure(cid, client, frame, meta))
             else:
                 client.frames_dropped += 1
 
         if tasks:
-            await asyncio.gather(*tasks)
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Drop clients whose send failed or timed out, in one pass
+        for client in [c for c in self.clients.values() if c.dead]:
+            self.disconnect(client.ws)
+            try:
+                await client.ws.close()
+            except Exception:
+                pass
 
-    async def _send_with_backpressure(self, cid: int, client: ClientState, message: dict):
+    async def _send_with_backpressure(self, cid: int, client: ClientState, frame, meta: str):
         """Send to a single client with backpressure tracking."""
         client.ready = False
         try:
-            await client.ws.send_json(message)
+            if frame is not None:
+                await asyncio.wait_for(client.ws.send_bytes(frame), SEND_TIMEOUT)
+            # Text frame: binary messages are reserved for JPEG frames
+            await asyncio.wait_for(client.ws.send_text(meta), SEND_TIMEOUT)
             client.frames_sent += 1
             client.last_send_time = time.time()
         except Exception:
-            # Client is dead — will be cleaned up by endpoint handler
-            pass
+            # Dead or stalled — removed by broadcast() after this cycle
+            client.dead = True
         finally:
             client.ready = True
 
@@ -6,9 +6,88 @@ import cv2
 import time
 import threading
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# OpenCV reads FFmpeg capture options from one process-wide env var at
+# VideoCapture construction. Strings are built once per transport; the lock
+# keeps concurrent open/test/reconnect calls from clobbering each other's
+# transport between setting the var and opening.
+_FFMPEG_OPTS = {
+    transport: (
+        f"rtsp_transport;{transport}"
+        "|analyzeduration;1000000"
+        "|probesize;500000"
+        "|fflags;nobuffer"
+        "|flags;low_delay"
+        "|max_delay;0"
+        "|reorder_queue_size;0"
+        "|stimeout;15000000"
+    )
+    for transport in ("tcp", "udp")
+}
+# Connection test: longer analysis, shorter socket timeout
+_FFMPEG_TEST_OPTS = {
+    transport: f"rtsp_transport;{transport}|analyzeduration;2000000|stimeout;10000000"
+    for transport in ("tcp", "udp")
+}
+_ffmpeg_env_lock = threading.Lock()
+
+# Ask FFmpeg for hardware decode (VAAPI/D3D11/MFX, whichever the build has);
+# OpenCV falls back to software when none is available. Frames still come
+# out as BGR — detection, drawing and JPEG encoding all expect it.
+_HW_DECODE_PARAMS = (
+    (cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY)
+    if hasattr(cv2, "VIDEO_ACCELERATION_ANY") else ()
+)
+
+
+def _open_capture(source, api=cv2.CAP_ANY):
+    """cv2.VideoCapture with hardware decode requested where supported."""
+    if _HW_DECODE_PARAMS:
+        return cv2.VideoCapture(source, api, _HW_DECODE_PARAMS)
+    return cv2.VideoCapture(source, api)
+
+# Transport that last delivered a frame, per URL. Opens try it first so a
+# UDP-only camera doesn't pay a full TCP timeout on every open/reconnect.
+_working_transport = {}
+
+
+def _transport_order(url: str):
+    """Transports to try for url, last known-good first."""
+    if _working_transport.get(url) == "udp":
+        return ("udp", "tcp")
+    return ("tcp", "udp")
+
+
+def _open_ffmpeg(url: str, options: str):
+    """cv2.VideoCapture(url, CAP_FFMPEG) with the given capture options."""
+    with _ffmpeg_env_lock:
+        if os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS") != options:
+            os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = options
+        return _open_capture(url, cv2.CAP_FFMPEG)
+
+
+def pin_current_thread(cores) -> bool:
+    """
+    Bind the calling thread to the given CPU cores (Linux only; elsewhere a
+    no-op). Keeps hot threads from being migrated mid-frame. Returns True
+    if the affinity was applied.
+    """
+    if not cores or not hasattr(os, "sched_setaffinity"):
+        return False
+    try:
+        cores = set(cores) & os.sched_getaffinity(0)
+        if not cores:
+            return False
+        os.sched_setaffinity(0, cores)  # pid 0 = calling thread on Linux
+        return True
+    except OSError as e:
+        logger.debug(f"CPU pinning skipped: {e}")
+        return False
+
 
 class StreamManager:
     """Manages video capture from RTSP streams, local files, or webcams."""
@@ -21,30 +100,72 @@ class StreamManager:
         self.lock = threading.Lock()
         
         # Zero-buffer components
-        self.latest_frame = None
+        # Newest frame, single slot. append (replaces) and popleft are atomic
+        # C calls, so the per-frame handoff takes no lock; self.lock only
+        # guards capture lifecycle (open/reconnect/release)
+        self._slot = deque(maxlen=1)
+        self.frame_ready = threading.Event()  # Set while the slot holds a new frame
+        # Two retrieve() destinations used alternately: the reader fills one
+        # while the consumer still holds the other, so no frame is allocated
+        self._bufs = [None, None]
+        self._back = 0
+        self.eof = False        # File source fully read
+        self.frame_skip = 1     # File source: decode every Nth frame
+        self.extra_skip = 0     # File source: load-driven skip on top (set by the engine)
+        self.cpu_cores = None   # Cores the grab thread is pinned to (set by the engine)
+        self.dropped = 0        # Frames grabbed but never retrieved (consumer was busy)
+        self._info = None       # Capture properties, snapshotted at open (see get_info)
         self.update_thread = None
         self._stop_thread = threading.Event()
 
     def _update_loop(self):
-        """Continuously grab frames in the background with error handling and auto-reconnect."""
+        """
+        Continuously grab frames in the background with error handling and auto-reconnect.
+
+        grab() only advances the stream; retrieve() (pixel conversion + copy
+        out) runs only when the consumer has taken the previous frame, so
+        frames nobody will infer on are never converted. Files wait for the
+        consumer and skip frame_skip - 1 + extra_skip frames between retrieves.
+        """
         retry_count = 0
         max_retries = 5
+        pin_current_thread(self.cpu_cores)
         
         while not self._stop_thread.is_set():
             if self.cap is not None and self.is_running:
                 try:
-                    ret, frame = self.cap.read()
+                    is_file = self.source_type == "file"
+                    if is_file:
+                        if self.eof or self._slot:
+                            time.sleep(0.002)
+                            continue
+                        for _ in range(self.frame_skip - 1 + self.extra_skip):
+                            self.cap.grab()
+
+                    ret = self.cap.grab()
+                    if ret and not self._slot:
+                        # Decode straight into the back buffer (OpenCV reallocates
+                        # only if the stream size changed, and we adopt that array)
+                        back = self._bufs[self._back]
+                        ret, frame = self.cap.retrieve(back) if back is not None else self.cap.retrieve()
+                        if ret:
+                            self._bufs[self._back] = frame
+                            self._back ^= 1
+                            self._slot.append(frame)
+                            self.frame_ready.set()
+                    elif ret:
+                        self.dropped += 1
                     if ret:
-                        with self.lock:
-                            self.latest_frame = frame
                         retry_count = 0  # Reset on success
+                    elif is_file:
+                        self.eof = True
                     else:
                         logger.warning("Stream read failed (empty frame)")
                         if self.source_type == "rtsp":
                             self._handle_reconnect()
                         time.sleep(0.1)
                 except Exception as e:
-                    logger.error(f"OpenCV Error in update loop: {e}")
+                    logger.error("OpenCV Error in update loop: %s", e)
                     if self.source_type == "rtsp":
                         self._handle_reconnect()
                     time.sleep(0.5)
@@ -56,16 +177,19 @@ class StreamManager:
         if self.source_type != "rtsp" or not self.source_url:
             return
             
-        logger.info(f"Attempting to reconnect to RTSP: {self.source_url}...")
+        logger.info("Attempting to reconnect to RTSP: %s...", self.source_url)
         if self.cap:
             self.cap.release()
             
         # Use simple reconn for now (will reuse existing open_rtsp logic if it was easier but we are inside thread)
         # To avoid complex recursion, we just try to recreate the capture here
-        cap = self._create_rtsp_capture(self.source_url, "tcp") # Default to TCP
+        transport = _transport_order(self.source_url)[0]  # Last transport that worked
+        cap = self._create_rtsp_capture(self.source_url, transport)
         if cap and cap.isOpened():
+            info = self._capture_info(cap, "rtsp")
             with self.lock:
                 self.cap = cap
+                self._info = info
                 logger.info("Reconnection successful!")
         else:
             logger.error("Reconnection failed.")
@@ -83,17 +207,20 @@ class StreamManager:
             self.update_thread.join(timeout=1.0)
             self.update_thread = None
 
+    @staticmethod
+    def _capture_info(cap, source_type: str) -> dict:
+        """Read the capture's fixed properties once (each get() is an FFmpeg call)."""
+        return {
+            "type": source_type,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "total_frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if source_type == "file" else None,
+        }
+
     def _create_rtsp_capture(self, url: str, transport: str = "tcp"):
         """Create RTSP capture with specified transport."""
-        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = (
-            f"rtsp_transport;{transport}"
-            "|analyzeduration;1000000"
-            "|probesize;500000"
-            "|fflags;nobuffer"
-            "|flags;low_delay"
-            "|stimeout;15000000"
-        )
-        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        cap = _open_ffmpeg(url, _FFMPEG_OPTS[transport])
         if cap.isOpened():
             # Minimal buffer for live streams
             cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
@@ -104,48 +231,65 @@ class StreamManager:
         """Open RTSP stream with TCP/UDP fallback."""
         self.stop()
 
-        for transport in ["tcp", "udp"]:
+        for transport in _transport_order(url):
             logger.info(f"Trying RTSP with {transport.upper()}...")
             cap = self._create_rtsp_capture(url, transport)
             if cap is not None and cap.isOpened():
                 ret, _ = cap.read()
                 if ret:
+                    _working_transport[url] = transport
+                    info = self._capture_info(cap, "rtsp")
                     with self.lock:
                         self.cap = cap
+                        self._info = info
                         self.source_type = "rtsp"
                         self.source_url = url
                         self.is_running = True
-                        self.latest_frame = None
+                        self._slot.clear()
+                        self.dropped = 0
                     self._start_thread()
                     return {"success": True, "transport": transport.upper()}
                 cap.release()
 
         return {"success": False, "error": "Failed to connect — check URL, credentials, and VPN"}
 
-    def open_file(self, file_path: str) -> dict:
-        """Open a local video file."""
+    def open_file(self, file_path: str, target_fps: float = None) -> dict:
+        """
+        Open a local video file. With target_fps, only every
+        round(source_fps / target_fps)-th frame is decoded for inference.
+        """
         self.stop()
 
-        cap = cv2.VideoCapture(file_path)
+        cap = _open_capture(file_path)
         if not cap.isOpened():
             return {"success": False, "error": "Failed to open video file"}
 
+        info = self._capture_info(cap, "file")
+        total, fps = info["total_frames"], info["fps"]
+
         with self.lock:
             self.cap = cap
+            self._info = info
             self.source_type = "file"
             self.source_url = file_path
             self.is_running = True
-            self.latest_frame = None
+            self._slot.clear()
+            self.eof = False
+            self.dropped = 0
+            self.extra_skip = 0
+            self.frame_skip = max(1, round(fps / target_fps)) if target_fps and fps > 0 else 1
         
         # Files don't necessarily need the thread, but for consistency:
         self._start_thread()
 
-        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
         return {"success": True, "total_frames": total, "fps": fps}
 
-    def open_webcam(self, camera_index: int = 0) -> dict:
-        """Open a local webcam/camera by index."""
+    def open_webcam(self, camera_index: int = 0, width: int = 1280, height: int = 720,
+                    fps: float = None) -> dict:
+        """
+        Open a local webcam/camera by index. MJPEG is requested so UVC cameras
+        can deliver full frame rate at the requested size (raw YUY2 is USB-bound).
+        """
         self.stop()
 
         cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
@@ -155,9 +299,12 @@ class StreamManager:
         if not cap.isOpened():
             return {"success": False, "error": f"Failed to open camera {camera_index}"}
 
-        # Set reasonable resolution
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        # FOURCC before size: drivers pick the mode list per pixel format
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            cap.set(cv2.CAP_PROP_FPS, fps)
         cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
         ret, _ = cap.read()
@@ -165,54 +312,75 @@ class StreamManager:
             cap.release()
             return {"success": False, "error": f"Camera {camera_index} opened but no frames"}
 
+        info = self._capture_info(cap, "webcam")
         with self.lock:
             self.cap = cap
+            self._info = info
             self.source_type = "webcam"
             self.source_url = str(camera_index)
             self.is_running = True
-            self.latest_frame = None
+            self._slot.clear()
+            self.dropped = 0
         
         self._start_thread()
 
-        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        return {"success": True, "camera_index": camera_index, "width": w, "height": h, "fps": fps}
+        return {"success": True, "camera_index": camera_index,
+                "width": info["width"], "height": info["height"], "fps": info["fps"]}
 
     @staticmethod
-    def scan_cameras(max_count: int = 5) -> list:
-        """Scan for available local cameras. Returns list of {index, name, width, height}."""
-        cameras = []
-        for i in range(max_count):
-            cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-            if not cap.isOpened():
-                cap = cv2.VideoCapture(i)
+    def _probe_camera(index: int):
+        """Open camera index and read one frame; returns its info dict or None."""
+        cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+        if not cap.isOpened():
+            cap = cv2.VideoCapture(index)
+        try:
             if cap.isOpened():
                 ret, _ = cap.read()
                 if ret:
-                    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                    cameras.append({
-                        "index": i,
-                        "name": f"Camera {i}",
-                        "width": w,
-                        "height": h
-                    })
-                cap.release()
-        return cameras
+                    return {
+                        "index": index,
+                        "name": f"Camera {index}",
+                        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                    }
+            return None
+        finally:
+            cap.release()
 
-    def read_frame(self):
-        """Read the latest frame from the background thread."""
-        with self.lock:
-            if not self.is_running or self.latest_frame is None:
-                return False, None
-            
-            frame = self.latest_frame.copy()
-            # If it's a file, we might want to keep frames to show everything,
-            # but for Live RTSP, we want to clear it so we don't process the same frame twice
-            # if processing is faster than the stream. 
-            # Actually, for RTSP, latest_frame will be overwritten anyway.
-            return True, frame
+    @staticmethod
+    def scan_cameras(max_count: int = 5) -> list:
+        """
+        Scan for available local cameras. Returns list of {index, name, width, height}.
+        Indices are probed concurrently (each open/read is a blocking device wait).
+        """
+        with ThreadPoolExecutor(max_workers=max_count) as ex:
+            results = ex.map(StreamManager._probe_camera, range(max_count))
+        return [cam for cam in results if cam is not None]
+
+    def read_frame(self, timeout: float = None):
+        """
+        Take the latest frame from the background thread, waiting up to
+        timeout seconds for one to arrive.
+
+        The single-frame slot is popped, so inference only ever sees the
+        newest frame and gets (False, None) until the reader delivers another;
+        stale frames are never queued. For files, check eof to tell the end of
+        the video apart from a frame that simply isn't ready yet.
+
+        The frame is one of two reused buffers, not a copy: it stays valid
+        until the next read_frame call and must not be kept beyond that.
+        """
+        if timeout and not self.frame_ready.is_set():
+            self.frame_ready.wait(timeout)
+
+        if not self.is_running:
+            return False, None
+        # Clear before popping: a frame appended after the pop re-sets the event
+        self.frame_ready.clear()
+        try:
+            return True, self._slot.popleft()
+        except IndexError:
+            return False, None
 
     def stop(self):
         """Stop and release the capture and background thread."""
@@ -222,37 +390,31 @@ class StreamManager:
             if self.cap is not None:
                 self.cap.release()
                 self.cap = None
-            self.latest_frame = None
+            self._info = None
+            self._slot.clear()
+            self.frame_ready.clear()
 
     def get_info(self) -> dict:
-        """Get stream info."""
-        with self.lock:
-            if self.cap is None:
-                return {"active": False}
-            return {
-                "active": self.is_running,
-                "type": self.source_type,
-                "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
-                "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
-                "fps": self.cap.get(cv2.CAP_PROP_FPS),
-                "total_frames": int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.source_type == "file" else None
-            }
+        """
+        Get stream info. Properties come from the snapshot taken at open, so
+        this never queries FFmpeg (or contends with the grab thread).
+        """
+        info = self._info
+        if info is None:
+            return {"active": False}
+        return {"active": self.is_running, **info, "dropped_frames": self.dropped}
 
     @staticmethod
     def test_rtsp(url: str) -> dict:
         """Test RTSP connection without keeping it open."""
-        for transport in ["tcp", "udp"]:
+        for transport in _transport_order(url):
             try:
-                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = (
-                    f"rtsp_transport;{transport}"
-                    "|analyzeduration;2000000"
-                    "|stimeout;10000000"
-                )
-                cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+                cap = _open_ffmpeg(url, _FFMPEG_TEST_OPTS[transport])
                 if cap.isOpened():
                     ret, _ = cap.read()
                     cap.release()
                     if ret:
+                        _working_transport[url] = transport
                         return {"success": True, "transport": transport.upper()}
             except Exception:
                 continue
@@ -3,24 +3,60 @@ tracker.py — Multi-Object Tracking Module
 
 Tracks vehicles across frames, calculates direction and speed.
 """
-import math
+import heapq
 import logging
+import numpy as np
+from collections import Counter
 from typing import Dict, List, Tuple, Optional
-from collections import deque
 
 logger = logging.getLogger(__name__)
 
+# Centroid history kept per track (also the length of the drawn trail buffer)
+TRAJECTORY_LEN = 30
+
+# Positions spanned by the speed estimate
+SPEED_WINDOW = 10
+
+# 8 compass directions (Indonesian), indexed from East counter-clockwise:
+# E, NE, N, NW, W, SW, S, SE
+DIRECTIONS = ("Timur", "Timur Laut", "Utara", "Barat Laut", "Barat", "Barat Daya", "Selatan", "Tenggara")
+
+# Full direction labels indexed by moving_down * 8 + compass index.
+# Increasing Y (moving down) = MASUK (Towards camera)
+# Decreasing Y (moving up) = KELUAR (Away from camera)
+DIRECTION_LABELS = tuple(
+    f"{flow} ({d})" for flow in ("KELUAR", "MASUK") for d in DIRECTIONS
+)
+
+# Tracks need this many positions before direction/speed are estimated
+MIN_MOTION_POINTS = 5
+
+# Removed Track objects kept for reuse (their ring arrays are recycled)
+TRACK_POOL_SIZE = 256
+
 
 class Track:
     """Represents a single tracked vehicle."""
     
     def __init__(self, track_id: int, class_name: str, bbox: List[float], frame_number: int):
+        # Last TRAJECTORY_LEN positions as parallel rings sharing one head:
+        # centroids (float32), frame numbers and an int32 copy for drawing.
+        # Each slot is written twice (i and i+LEN), so the newest k entries
+        # are always one contiguous slice — no per-read copy or wrap handling
+        self._xy = np.zeros((2 * TRAJECTORY_LEN, 2), dtype=np.float32)
+        self._frames = np.zeros(2 * TRAJECTORY_LEN, dtype=np.int64)
+        self._traj = np.zeros((2 * TRAJECTORY_LEN, 2), dtype=np.int32)
+        self.reset(track_id, class_name, bbox, frame_number)
+
+    def reset(self, track_id: int, class_name: str, bbox: List[float], frame_number: int):
+        """(Re)initialise as a new track, reusing the allocated rings."""
         self.track_id = track_id
         self.class_name = class_name
         self.bbox = bbox  # [x1, y1, x2, y2]
         self.centroid = self._calculate_centroid(bbox)
-        self.trajectory = deque(maxlen=30)  # Store last 30 positions
-        self.trajectory.append((self.centroid, frame_number))
+        self._thead = 0
+        self._tlen = 0
+        self._push_point(self.centroid, frame_number)
         self.frames_tracked = 1
         self.speed_kmh = 0.0
         self.direction = "Unknown"
@@ -37,86 +73,31 @@ class Track:
         """Update track with new detection."""
         self.bbox = bbox
         self.centroid = self._calculate_centroid(bbox)
-        self.trajectory.append((self.centroid, frame_number))
+        self._push_point(self.centroid, frame_number)
         self.frames_tracked += 1
         self.last_update_frame = frame_number
     
-    def calculate_direction(self) -> str:
-        """Calculate movement direction based on trajectory."""
-        if len(self.trajectory) < 5:
-            return "Unknown"
-        
-        # Get first and last positions from trajectory
-        start_pos, _ = self.trajectory[0]
-        end_pos, _ = self.trajectory[-1]
-        
-        dx = end_pos[0] - start_pos[0]
-        dy = end_pos[1] - start_pos[1]
-        
-        # Determine Flow (Masuk/Keluar) based on Y axis
-        # Increasing Y (moving down) = MASUK (Towards camera)
-        # Decreasing Y (moving up) = KELUAR (Away from camera)
-        flow = "MASUK" if dy > 0 else "KELUAR"
-        
-        # Calculate angle in degrees
-        angle = math.degrees(math.atan2(-dy, dx))  # Negative dy because y increases downward
-        
-        # Normalize to 0-360
-        if angle < 0:
-            angle += 360
-        
-        # Map to 8 compass directions (Indonesian)
-        # E, NE, N, NW, W, SW, S, SE
-        directions = ["Timur", "Timur Laut", "Utara", "Barat Laut", "Barat", "Barat Daya", "Selatan", "Tenggara"]
-        index = int((angle + 22.5) / 45) % 8
-        
-        return f"{flow} ({directions[index]})"
-    
-    def calculate_speed(self, fps: float, pixels_per_meter: float) -> float:
+    def _push_point(self, point: Tuple[float, float], frame_number: int):
+        """Append a centroid and its frame number to the trajectory rings."""
+        i = self._thead
+        j = i + TRAJECTORY_LEN
+        self._xy[i] = self._xy[j] = point
+        self._frames[i] = self._frames[j] = frame_number
+        self._traj[i] = self._traj[j] = point
+        self._thead = (i + 1) % TRAJECTORY_LEN
+        self._tlen = min(self._tlen + 1, TRAJECTORY_LEN)
+
+    def traj_slice(self, n: Optional[int] = None) -> np.ndarray:
+        """Newest n trail points, oldest first, as an (n, 2) int32 view."""
+        n = self._tlen if n is None else min(n, self._tlen)
+        end = self._thead + TRAJECTORY_LEN
+        return self._traj[end - n:end]
+
+    def to_dict(self) -> dict:
         """
-        Calculate speed in km/h.
-        
-        Args:
-            fps: Frames per second of the video stream
-            pixels_per_meter: Calibration factor (pixels per meter)
-        
-        Returns:
-            Speed in km/h
+        Convert track to a dictionary. "trajectory" is an int32 view into the
+        track's ring (last 10 points) for draw_boxes; tolist() it before JSON.
         """
-        if len(self.trajectory) < 5 or fps <= 0 or pixels_per_meter <= 0:
-            return 0.0
-        
-        # Calculate displacement over last N frames
-        window_size = min(10, len(self.trajectory))
-        start_pos, start_frame = self.trajectory[-window_size]
-        end_pos, end_frame = self.trajectory[-1]
-        
-        # Calculate pixel distance
-        dx = end_pos[0] - start_pos[0]
-        dy = end_pos[1] - start_pos[1]
-        pixel_distance = math.sqrt(dx**2 + dy**2)
-        
-        # Convert to meters
-        distance_meters = pixel_distance / pixels_per_meter
-        
-        # Calculate time elapsed
-        frames_elapsed = end_frame - start_frame
-        if frames_elapsed == 0:
-            return 0.0
-        
-        time_seconds = frames_elapsed / fps
-        
-        # Calculate speed in m/s, then convert to km/h
-        speed_ms = distance_meters / time_seconds
-        speed_kmh = speed_ms * 3.6
-        
-        # Clamp to reasonable values (0-200 km/h)
-        speed_kmh = max(0, min(200, speed_kmh))
-        
-        return round(speed_kmh, 1)
-    
-    def to_dict(self) -> dict:
-        """Convert track to dictionary for JSON serialization."""
         return {
             "track_id": self.track_id,
             "class": self.class_name,
@@ -125,7 +106,7 @@ class Track:
             "speed_kmh": self.speed_kmh,
             "direction": self.direction,
             "frames_tracked": self.frames_tracked,
-            "trajectory": [list(pos) for pos, _ in list(self.trajectory)[-10:]]  # Last 10 points
+            "trajectory": self.traj_slice(10)  # Last 10 points
         }
 
 
@@ -145,6 +126,11 @@ class VehicleTracker:
         self.pixels_per_meter = pixels_per_meter
         self.frame_number = 0
         self.max_age = 30  # Remove tracks not updated for 30 frames
+        # Lazy expiry: (frame at which the track goes stale, track_id), pushed on
+        # every update; entries superseded by a later update are skipped on pop
+        self._expiry_heap: List[Tuple[int, int]] = []
+        # Removed tracks, recycled for new ids instead of reallocating rings
+        self._pool: List[Track] = []
         
         logger.info(f"VehicleTracker initialized: fps={fps}, ppm={pixels_per_meter}")
     
@@ -168,39 +154,88 @@ class VehicleTracker:
                 continue
             
             current_track_ids.add(track_id)
+            heapq.heappush(self._expiry_heap, (self.frame_number + self.max_age + 1, track_id))
             
             if track_id in self.tracks:
                 # Update existing track
                 self.tracks[track_id].update(det["bbox"], self.frame_number)
             else:
-                # Create new track
-                self.tracks[track_id] = Track(
-                    track_id=track_id,
-                    class_name=det["class_name"],
-                    bbox=det["bbox"],
-                    frame_number=self.frame_number
-                )
-        
-        # Remove stale tracks
-        stale_ids = []
-        for track_id, track in self.tracks.items():
-            if self.frame_number - track.last_update_frame > self.max_age:
-                stale_ids.append(track_id)
+                # Create new track (from the pool when one is free)
+                if self._pool:
+                    track = self._pool.pop()
+                    track.reset(track_id, det["class_name"], det["bbox"], self.frame_number)
+                else:
+                    track = Track(
+                        track_id=track_id,
+                        class_name=det["class_name"],
+                        bbox=det["bbox"],
+                        frame_number=self.frame_number
+                    )
+                self.tracks[track_id] = track
         
-        for track_id in stale_ids:
-            del self.tracks[track_id]
-            logger.debug(f"Removed stale track {track_id}")
+        # Remove stale tracks (only entries due this frame are touched)
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= self.frame_number:
+            _, track_id = heapq.heappop(heap)
+            track = self.tracks.get(track_id)
+            if track is not None and self.frame_number - track.last_update_frame > self.max_age:
+                del self.tracks[track_id]
+                if len(self._pool) < TRACK_POOL_SIZE:
+                    self._pool.append(track)
+                logger.debug("Removed stale track %s", track_id)
         
         # Calculate speed and direction for all active tracks
-        tracking_data = []
-        for track_id in current_track_ids:
-            if track_id in self.tracks:
-                track = self.tracks[track_id]
-                track.direction = track.calculate_direction()
-                track.speed_kmh = track.calculate_speed(self.fps, self.pixels_per_meter)
-                tracking_data.append(track.to_dict())
-        
-        return tracking_data
+        active = [self.tracks[tid] for tid in current_track_ids if tid in self.tracks]
+        self._update_motion(active)
+
+        return [track.to_dict() for track in active]
+
+    def _update_motion(self, tracks: List[Track]):
+        """
+        Refresh direction and speed (km/h) for all given tracks with one set
+        of NumPy operations. Direction spans each track's whole stored
+        trajectory; speed uses the displacement over the last SPEED_WINDOW
+        positions.
+        """
+        moving = []
+        for track in tracks:
+            if track._tlen >= MIN_MOTION_POINTS:
+                moving.append(track)
+            else:
+                track.direction = "Unknown"
+                track.speed_kmh = 0.0
+        if not moving:
+            return
+
+        # Gather newest / oldest / window-start rows from every ring at once
+        rows = np.arange(len(moving))
+        lens = np.fromiter((t._tlen for t in moving), dtype=np.intp, count=len(moving))
+        ends = np.fromiter((t._thead for t in moving), dtype=np.intp, count=len(moving)) + (TRAJECTORY_LEN - 1)
+        firsts = ends - lens + 1
+        wins = ends - np.minimum(lens, SPEED_WINDOW) + 1
+        xy = np.stack([t._xy for t in moving]).astype(np.float64)
+        frames = np.stack([t._frames for t in moving])
+
+        end_xy = xy[rows, ends]
+        d = end_xy - xy[rows, firsts]
+        # Negative dy because y increases downward; normalise to 0-360
+        angle = np.degrees(np.arctan2(-d[:, 1], d[:, 0])) % 360
+        labels = (d[:, 1] > 0) * 8 + ((angle + 22.5) // 45).astype(np.intp) % 8
+
+        if self.fps > 0 and self.pixels_per_meter > 0:
+            dw = end_xy - xy[rows, wins]
+            frames_elapsed = frames[rows, ends] - frames[rows, wins]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                # pixels → meters, frames → seconds, m/s → km/h
+                speed = np.hypot(dw[:, 0], dw[:, 1]) / self.pixels_per_meter / (frames_elapsed / self.fps) * 3.6
+            # Clamp to reasonable values (0-200 km/h)
+            speed = np.where(frames_elapsed > 0, np.clip(speed, 0, 200), 0.0).round(1)
+        else:
+            speed = np.zeros(len(moving))
+
+        for track, label, kmh in zip(moving, labels.tolist(), speed.tolist()):
+            track.direction = DIRECTION_LABELS[label]
+            track.speed_kmh = kmh
     
     def set_calibration(self, fps: float = None, pixels_per_meter: float = None):
         """Update calibration parameters."""
@@ -215,6 +250,7 @@ class VehicleTracker:
     def reset(self):
         """Clear all tracks."""
         self.tracks.clear()
+        self._expiry_heap.clear()
         self.frame_number = 0
         logger.info("Tracker reset")
     
@@ -227,17 +263,15 @@ class VehicleTracker:
                 "direction_distribution": {}
             }
         
-        speeds = [t.speed_kmh for t in self.tracks.values() if t.speed_kmh > 0]
-        avg_speed = sum(speeds) / len(speeds) if speeds else 0.0
+        tracks = self.tracks.values()
+        speeds = np.fromiter((t.speed_kmh for t in tracks if t.speed_kmh > 0), dtype=np.float32)
+        avg_speed = float(speeds.mean()) if speeds.size else 0.0
         
         # Direction distribution
-        directions = [t.direction for t in self.tracks.values() if t.direction != "Unknown"]
-        direction_dist = {}
-        for d in directions:
-            direction_dist[d] = direction_dist.get(d, 0) + 1
+        direction_dist = Counter(t.direction for t in tracks if t.direction != "Unknown")
         
         return {
             "active_tracks": len(self.tracks),
             "avg_speed": round(avg_speed, 1),
-            "direction_distribution": direction_dist
+            "direction_distribution": dict(direction_dist)
         }
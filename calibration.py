@@ -0,0 +1,46 @@
+"""
+calibration.py — INT8 Calibration Dataset Helpers
+
+Shared by export_engine.py and backend/export_trt.py: samples frames from
+traffic videos and writes the minimal Ultralytics dataset file TensorRT INT8
+calibration reads.
+"""
+import os
+
+import cv2
+
+
+def extract_frames(video_paths: list, image_dir: str, num_frames: int) -> int:
+    """Write evenly spaced frames from all videos into image_dir; returns the count."""
+    os.makedirs(image_dir, exist_ok=True)
+    per_video = max(1, num_frames // len(video_paths))
+    written = 0
+
+    for v, video_path in enumerate(video_paths):
+        cap = cv2.VideoCapture(video_path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(1, total // per_video)
+        for idx in range(0, max(total, 1), step):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            cv2.imwrite(os.path.join(image_dir, f"v{v}_{idx:06d}.jpg"), frame)
+            written += 1
+            if written >= per_video * (v + 1):
+                break
+        cap.release()
+    return written
+
+
+def write_dataset_yaml(calib_dir: str, class_names: dict) -> str:
+    """
+    Minimal Ultralytics dataset file pointing train/val at the calibration
+    images. class_names must be the model's full id -> name map (YOLO(...).names):
+    Ultralytics rejects datasets whose class ids are not exactly 0..n-1.
+    """
+    names = "\n".join(f"  {cid}: {name}" for cid, name in class_names.items())
+    yaml_path = os.path.join(calib_dir, "calib.yaml")
+    with open(yaml_path, "w") as f:
+        f.write(f"path: {os.path.abspath(calib_dir)}\ntrain: images\nval: images\nnames:\n{names}\n")
+    return yaml_path
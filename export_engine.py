@@ -0,0 +1,63 @@
+"""
+TensorRT INT8 Engine Export
+===========================
+One-off export of yolov8n.pt to a TensorRT INT8 engine. Calibration frames
+are sampled from representative traffic videos (uploaded files or saved
+RTSP recordings) and written as an Ultralytics dataset under calib/.
+
+Usage:
+    python export_engine.py --video sample_traffic.mp4 [--video cam2.mp4 ...]
+
+Produces yolov8n-int8-<gpu>.engine, which app.py loads in preference to
+the FP16 engine on the same GPU. Engines are GPU-architecture specific, so
+run this on the deployment machine.
+"""
+
+import argparse
+import os
+import re
+
+import torch
+from ultralytics import YOLO
+
+from calibration import extract_frames, write_dataset_yaml
+
+MODEL_PATH = "yolov8n.pt"
+MODEL_INPUT_SIZE = 640
+CALIB_DIR = "calib"
+
+
+def int8_engine_path() -> str:
+    """Must match app.py's _tensorrt_engine_path(int8=True)."""
+    gpu = re.sub(r"[^A-Za-z0-9]+", "_", torch.cuda.get_device_name(0)).strip("_").lower()
+    return f"{os.path.splitext(MODEL_PATH)[0]}-int8-{gpu}.engine"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLOv8 to a TensorRT INT8 engine")
+    parser.add_argument("--video", action="append", required=True, help="Traffic video used for calibration (repeatable)")
+    parser.add_argument("--model", default=MODEL_PATH, help="PyTorch model to export")
+    parser.add_argument("--calib-dir", default=CALIB_DIR, help="Where calibration images are written")
+    parser.add_argument("--frames", type=int, default=300, help="Number of calibration frames (200-500)")
+    parser.add_argument("--batch", type=int, default=8, help="Calibration / max engine batch size")
+    args = parser.parse_args()
+
+    count = extract_frames(args.video, os.path.join(args.calib_dir, "images"), args.frames)
+    print(f"Extracted {count} calibration frames to {args.calib_dir}")
+
+    model = YOLO(args.model)
+    exported = model.export(
+        format="engine",
+        int8=True,
+        data=write_dataset_yaml(args.calib_dir, model.names),
+        workspace=4,
+        batch=args.batch,
+        imgsz=MODEL_INPUT_SIZE,
+    )
+    engine_path = int8_engine_path()
+    os.replace(exported, engine_path)
+    print(f"Saved INT8 engine to {engine_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@
  *  - FPS counter: rolling 1-second window
  *  - Latency indicator: time from WS receive to rAF commit
  *  - Metadata handled separately from frame (backend sends meta every Nth frame)
+ *  - Frames arrive as binary JPEG messages (no base64) and are shown via
+ *    object URLs, revoked as soon as they are replaced or dropped
  */
 import { ref, reactive, onUnmounted } from 'vue'
 
@@ -54,8 +56,10 @@ export function useDetection() {
     // ── rAF Render Loop ──
     function renderLoop() {
         if (pendingFrame) {
+            const previousFrame = currentFrame.value
             currentFrame.value = pendingFrame
             pendingFrame = null
+            if (previousFrame) URL.revokeObjectURL(previousFrame)
 
             // Latency = time since WS received this frame
             latencyMs.value = Math.round(performance.now() - pendingFrameTime)
@@ -84,6 +88,7 @@ export function useDetection() {
 
         statusMessage.value = 'Connecting...'
         ws = new WebSocket(url)
+        ws.binaryType = 'blob'
 
         ws.onopen = () => {
             isConnected.value = true
@@ -94,9 +99,16 @@ export function useDetection() {
         }
 
         ws.onmessage = (event) => {
+            // Binary message = JPEG frame → double-buffer (old pending frame is dropped)
+            if (event.data instanceof Blob) {
+                if (pendingFrame) URL.revokeObjectURL(pendingFrame)
+                pendingFrame = URL.createObjectURL(event.data)
+                pendingFrameTime = performance.now()
+                return
+            }
+
             try {
                 const data = JSON.parse(event.data)
-                const receiveTime = performance.now()
 
                 // Stop/complete
                 if (data.status === 'stopped' || data.status === 'complete') {
@@ -110,12 +122,6 @@ export function useDetection() {
                 if (data.is_running !== undefined) isRunning.value = data.is_running
                 if (data.source_type) sourceType.value = data.source_type
 
-                // Frame → double-buffer (old pending frame is dropped)
-                if (data.frame) {
-                    pendingFrame = 'data:image/jpeg;base64,' + data.frame
-                    pendingFrameTime = receiveTime
-                }
-
                 // Metadata (sent every Nth frame by backend)
                 if (data.counts) Object.assign(counts, data.counts)
                 if (data.frame_count !== undefined) frameCount.value = data.frame_count
@@ -225,6 +231,8 @@ export function useDetection() {
         if (ws) ws.close()
         if (reconnectTimer) clearTimeout(reconnectTimer)
         if (rafId) cancelAnimationFrame(rafId)
+        if (pendingFrame) URL.revokeObjectURL(pendingFrame)
+        if (currentFrame.value) URL.revokeObjectURL(currentFrame.value)
     })
 
     return {
@@ -0,0 +1,89 @@
+"""
+INT8 Model Quantization
+========================
+Offline static INT8 quantization of the exported YOLOv8 ONNX model.
+Calibration frames are sampled from a representative traffic video.
+
+Usage:
+    python quantize_model.py --video sample_traffic.mp4
+
+Produces yolov8n-int8.onnx, which app.py loads in preference to the
+FP32 export when present.
+"""
+
+import argparse
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quantize_static,
+)
+
+from app import letterbox
+
+ONNX_MODEL_PATH = "yolov8n.onnx"
+INT8_MODEL_PATH = "yolov8n-int8.onnx"
+
+
+class VideoCalibrationReader(CalibrationDataReader):
+    """Feed evenly spaced video frames to the ONNX Runtime calibrator."""
+
+    def __init__(self, video_path: str, input_name: str, num_frames: int = 100):
+        self.input_name = input_name
+        self.blobs = iter(self._sample_blobs(video_path, num_frames))
+
+    @staticmethod
+    def _sample_blobs(video_path: str, num_frames: int) -> list:
+        cap = cv2.VideoCapture(video_path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(1, total // num_frames)
+
+        blobs = []
+        for idx in range(0, max(total, 1), step):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # Same preprocessing as app.py at runtime, so the calibrated
+            # activation ranges match what the INT8 model will actually see
+            image, _ = letterbox(frame)
+            blob = image[..., ::-1].transpose(2, 0, 1) * np.float32(1 / 255.0)
+            blobs.append(blob[np.newaxis])
+            if len(blobs) >= num_frames:
+                break
+        cap.release()
+        return blobs
+
+    def get_next(self):
+        blob = next(self.blobs, None)
+        return None if blob is None else {self.input_name: blob.astype(np.float32)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize YOLOv8 ONNX model to INT8")
+    parser.add_argument("--video", required=True, help="Traffic video used for calibration")
+    parser.add_argument("--model", default=ONNX_MODEL_PATH, help="FP32 ONNX model")
+    parser.add_argument("--output", default=INT8_MODEL_PATH, help="INT8 ONNX output path")
+    parser.add_argument("--frames", type=int, default=100, help="Number of calibration frames")
+    args = parser.parse_args()
+
+    input_name = ort.InferenceSession(args.model).get_inputs()[0].name
+    reader = VideoCalibrationReader(args.video, input_name, args.frames)
+    quantize_static(
+        args.model,
+        args.output,
+        reader,
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+    print(f"Saved INT8 model to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,12 +13,28 @@ Usage:
     ui.update_charts(placeholders, vehicle_counts, timeline_data)
 """
 
+import sys
+import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
-from dataclasses import dataclass
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Dict, List, Optional, Any
 
+# Faster Plotly figure JSON when orjson is installed
+try:
+    import orjson  # noqa: F401
+    import plotly.io as pio
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    pass
+
+# Partial reruns: st.fragment (1.37+), st.experimental_fragment (1.33+);
+# on older Streamlit the decorated function just runs as part of the script
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -33,6 +49,90 @@ COLORS = {
     "speed": {"hex": "#ff6b6b", "name": "Red"}
 }
 
+# Counted vehicle types, in chart / VehicleCounts order
+VEHICLE_TYPES = ("car", "motorcycle", "bus", "truck")
+_VEHICLE_INDEX = {label: i for i, label in enumerate(VEHICLE_TYPES)}
+
+# ============================================================================
+# VEHICLE COUNTS
+# ============================================================================
+
+@dataclass(eq=False)
+class VehicleCounts(Mapping):
+    """
+    Per-type vehicle counts stored as one int32 array in VEHICLE_TYPES order.
+    
+    Reads like the Dict[str, int] the components accept (counts["car"],
+    .get(), .items()), so it can be passed anywhere vehicle_counts is; the
+    chart builders use the array directly instead of iterating the mapping.
+    """
+    arr: np.ndarray = field(default_factory=lambda: np.zeros(len(VEHICLE_TYPES), dtype=np.int32))
+    
+    def __getitem__(self, label: str) -> int:
+        return int(self.arr[_VEHICLE_INDEX[label]])
+    
+    def __setitem__(self, label: str, value: int):
+        self.arr[_VEHICLE_INDEX[label]] = value
+    
+    def __iter__(self):
+        return iter(VEHICLE_TYPES)
+    
+    def __len__(self) -> int:
+        return len(VEHICLE_TYPES)
+    
+    def increment(self, label: str, n: int = 1):
+        """Add n to one vehicle type's count."""
+        self.arr[_VEHICLE_INDEX[label]] += n
+
+def _counts_arrays(vehicle_counts) -> tuple:
+    """(labels tuple, int32 values) for a counts dict or VehicleCounts."""
+    if isinstance(vehicle_counts, VehicleCounts):
+        return VEHICLE_TYPES, vehicle_counts.arr.copy()
+    return tuple(vehicle_counts), np.fromiter(vehicle_counts.values(), dtype=np.int32,
+                                              count=len(vehicle_counts))
+
+class TimelineBuffer:
+    """
+    Last `capacity` per-frame vehicle counts in a preallocated uint16 ring.
+    
+    Each value is written twice (i and i + capacity), so view() is always
+    one contiguous, oldest-first slice: no copy, no wrap handling.
+    """
+    
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.buf = np.zeros(2 * capacity, dtype=np.uint16)
+        self.head = 0   # Next write position
+        self.n = 0      # Values held (<= capacity)
+    
+    def append(self, count: int):
+        """Add one frame's count, dropping the oldest once full."""
+        self.buf[self.head] = self.buf[self.head + self.capacity] = count
+        self.head = (self.head + 1) % self.capacity
+        self.n = min(self.n + 1, self.capacity)
+    
+    def view(self) -> np.ndarray:
+        """Held counts, oldest first, as a view into the ring."""
+        end = self.head + self.capacity
+        return self.buf[end - self.n:end]
+    
+    def __len__(self) -> int:
+        return self.n
+
+def _timeline_array(timeline_data) -> np.ndarray:
+    """Timeline as an ndarray, from a list, ndarray or TimelineBuffer."""
+    if isinstance(timeline_data, TimelineBuffer):
+        return timeline_data.view()
+    if isinstance(timeline_data, np.ndarray):
+        return timeline_data
+    return np.asarray(timeline_data, dtype=np.int32)
+
+def _counts_key(vehicle_counts) -> int:
+    """Cheap change-detection hash of a counts dict or VehicleCounts."""
+    if isinstance(vehicle_counts, VehicleCounts):
+        return hash(vehicle_counts.arr.tobytes())
+    return hash(tuple(vehicle_counts.items()))
+
 # ============================================================================
 # PAGE SETUP (Call this first in your main app)
 # ============================================================================
@@ -145,6 +245,13 @@ DARK_THEME_CSS = """
     .stat-card.total { border-left: 4px solid #00d4ff; }
     .stat-card.speed { border-left: 4px solid #ff6b6b; }
     
+    /* 2-column card grid (one markdown element instead of six) */
+    .stat-grid {
+        display: grid;
+        grid-template-columns: 1fr 1fr;
+        column-gap: 16px;
+    }
+    
     /* ===== SECTION HEADER STYLES ===== */
     .section-header {
         color: #00d4ff;
@@ -236,6 +343,15 @@ def render_header(title: str = "Traffic Monitoring Dashboard",
 # STAT CARD COMPONENT
 # ============================================================================
 
+# Single-line so cards can be concatenated into one markdown HTML block
+_STAT_CARD_TMPL = (
+    '<div class="stat-card {card_type}">'
+    '<div class="icon">{icon}</div>'
+    '<div class="label">{label}</div>'
+    '<div class="value">{value:,}</div>'
+    '</div>'
+)
+
 def render_stat_card(icon: str, label: str, value: int, card_type: str = "") -> str:
     """
     Generate HTML for a styled KPI stat card.
@@ -249,13 +365,7 @@ def render_stat_card(icon: str, label: str, value: int, card_type: str = "") ->
     Returns:
         HTML string for the stat card
     """
-    return f"""
-    <div class="stat-card {card_type}">
-        <div class="icon">{icon}</div>
-        <div class="label">{label}</div>
-        <div class="value">{value:,}</div>
-    </div>
-    """
+    return _STAT_CARD_TMPL.format(icon=icon, label=label, value=value, card_type=card_type)
 
 def render_stat_cards_grid(vehicle_counts: Dict[str, int], avg_speed: int = 0):
     """
@@ -267,49 +377,117 @@ def render_stat_cards_grid(vehicle_counts: Dict[str, int], avg_speed: int = 0):
     """
     total = sum(vehicle_counts.values())
     
-    # Row 1: Car and Motorcycle
-    col1, col2 = st.columns(2)
-    with col1:
-        st.markdown(render_stat_card("🚗", "Cars", vehicle_counts.get("car", 0), "car"), unsafe_allow_html=True)
-    with col2:
-        st.markdown(render_stat_card("🏍️", "Motorcycles", vehicle_counts.get("motorcycle", 0), "motorcycle"), unsafe_allow_html=True)
-    
-    # Row 2: Bus and Truck
-    col3, col4 = st.columns(2)
-    with col3:
-        st.markdown(render_stat_card("🚌", "Buses", vehicle_counts.get("bus", 0), "bus"), unsafe_allow_html=True)
-    with col4:
-        st.markdown(render_stat_card("🚚", "Trucks", vehicle_counts.get("truck", 0), "truck"), unsafe_allow_html=True)
-    
-    # Row 3: Total and Speed
-    col5, col6 = st.columns(2)
-    with col5:
-        st.markdown(render_stat_card("📊", "Total", total, "total"), unsafe_allow_html=True)
-    with col6:
-        st.markdown(render_stat_card("⚡", "Avg km/h", avg_speed, "speed"), unsafe_allow_html=True)
+    # Rows: Car/Motorcycle, Bus/Truck, Total/Speed — one HTML grid, one markdown call
+    cards = (
+        render_stat_card("🚗", "Cars", vehicle_counts.get("car", 0), "car"),
+        render_stat_card("🏍️", "Motorcycles", vehicle_counts.get("motorcycle", 0), "motorcycle"),
+        render_stat_card("🚌", "Buses", vehicle_counts.get("bus", 0), "bus"),
+        render_stat_card("🚚", "Trucks", vehicle_counts.get("truck", 0), "truck"),
+        render_stat_card("📊", "Total", total, "total"),
+        render_stat_card("⚡", "Avg km/h", avg_speed, "speed"),
+    )
+    st.markdown(
+        f'<div class="stat-grid">{"".join(cards)}</div>',
+        unsafe_allow_html=True,
+    )
 
 # ============================================================================
 # CHART COMPONENTS
 # ============================================================================
 
+# Points averaged by the timeline's moving-average trace
+MOVING_AVG_WINDOW = 5
+
+# Static chart layouts, built once; only traces (and the timeline title)
+# depend on the data
+_BAR_LAYOUT = dict(
+    title=dict(text="Vehicle Distribution", font=dict(color='#8b9dc3', size=14), x=0.5),
+    uirevision='static',
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(30,33,48,0.8)',
+    margin=dict(l=20, r=20, t=50, b=40),
+    height=220,
+    xaxis=dict(
+        tickfont=dict(color='#8b9dc3'),
+        gridcolor='rgba(61,68,102,0.3)'
+    ),
+    yaxis=dict(
+        tickfont=dict(color='#8b9dc3'),
+        gridcolor='rgba(61,68,102,0.3)',
+        showgrid=True
+    )
+)
+
+_PIE_LAYOUT = dict(
+    title=dict(text="Vehicle Distribution", font=dict(color='#8b9dc3', size=14), x=0.5),
+    showlegend=False,
+    uirevision='static',
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    margin=dict(l=10, r=10, t=50, b=10),
+    height=220
+)
+
+_TIMELINE_LAYOUT = dict(
+    uirevision='static',
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(30,33,48,0.8)',
+    margin=dict(l=60, r=30, t=60, b=50),
+    height=200,
+    xaxis=dict(
+        title="Processed Frame",
+        title_font=dict(color='#8b9dc3', size=12),
+        tickfont=dict(color='#8b9dc3'),
+        gridcolor='rgba(61,68,102,0.3)',
+        showgrid=True,
+        zeroline=False
+    ),
+    yaxis=dict(
+        title="Vehicles Detected",
+        title_font=dict(color='#8b9dc3', size=12),
+        tickfont=dict(color='#8b9dc3'),
+        gridcolor='rgba(61,68,102,0.3)',
+        showgrid=True,
+        zeroline=False
+    ),
+    legend=dict(
+        orientation='h',
+        yanchor='bottom',
+        y=1.02,
+        xanchor='center',
+        x=0.5,
+        font=dict(color='#8b9dc3', size=10)
+    ),
+    hovermode='x unified'
+)
+
+@lru_cache(maxsize=16)
+def _label_styles(labels: tuple) -> tuple:
+    """(colors, capitalized labels, pie pulls) for a label set, computed once per set."""
+    return (
+        tuple(COLORS[label]["hex"] for label in labels),
+        tuple(label.capitalize() for label in labels),
+        (0.02,) * len(labels),  # Pie slice pull
+    )
+
 def create_distribution_chart(vehicle_counts: Dict[str, int], chart_type: str = "pie") -> go.Figure:
     """
     Create a vehicle distribution chart (pie or bar).
     
     Args:
-        vehicle_counts: Dict mapping vehicle type to count
+        vehicle_counts: Dict (or VehicleCounts) mapping vehicle type to count
         chart_type: "pie" for donut chart, "bar" for bar chart
     
     Returns:
         Plotly Figure object
     """
-    labels = list(vehicle_counts.keys())
-    values = list(vehicle_counts.values())
-    colors = [COLORS[label]["hex"] for label in labels]
+    # ndarrays take Plotly's typed-array fast path instead of per-element validation
+    labels, values = _counts_arrays(vehicle_counts)
+    colors, display_labels, pull = _label_styles(labels)
     
     # Use placeholder values if no data
-    if sum(values) == 0:
-        values = [1] * len(labels)
+    if not values.any():
+        values = np.ones(len(labels), dtype=np.int32)
     
     if chart_type == "bar":
         # Bar chart version
@@ -320,69 +498,56 @@ def create_distribution_chart(vehicle_counts: Dict[str, int], chart_type: str =
             text=values,
             textposition='outside',
             textfont=dict(color='white', size=12)
-        )])
-        
-        fig.update_layout(
-            title=dict(text="Vehicle Distribution", font=dict(color='#8b9dc3', size=14), x=0.5),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(30,33,48,0.8)',
-            margin=dict(l=20, r=20, t=50, b=40),
-            height=220,
-            xaxis=dict(
-                tickfont=dict(color='#8b9dc3'),
-                gridcolor='rgba(61,68,102,0.3)'
-            ),
-            yaxis=dict(
-                tickfont=dict(color='#8b9dc3'),
-                gridcolor='rgba(61,68,102,0.3)',
-                showgrid=True
-            )
-        )
+        )], layout=_BAR_LAYOUT)
     else:
         # Pie/Donut chart version
         fig = go.Figure(data=[go.Pie(
-            labels=[l.capitalize() for l in labels],
+            labels=display_labels,
             values=values,
             hole=0.45,
             marker=dict(colors=colors, line=dict(color='#1e2130', width=2)),
             textinfo='label+percent',
             textfont=dict(color='white', size=11),
             hovertemplate='%{label}: %{value}<extra></extra>',
-            pull=[0.02] * len(labels)  # Slight pull for 3D effect
-        )])
-        
-        fig.update_layout(
-            title=dict(text="Vehicle Distribution", font=dict(color='#8b9dc3', size=14), x=0.5),
-            showlegend=False,
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=10, r=10, t=50, b=10),
-            height=220
-        )
+            pull=pull  # Slight pull for 3D effect
+        )], layout=_PIE_LAYOUT)
     
     return fig
 
-def create_timeline_chart(timeline_data: List[int], 
+def _moving_average(values: np.ndarray, window: int = MOVING_AVG_WINDOW) -> np.ndarray:
+    """Rolling mean from one cumulative sum; NaN (a gap) until the window fills."""
+    cs = np.cumsum(values, dtype=np.float64)
+    avg = np.full(len(cs), np.nan)
+    avg[window - 1:] = cs[window - 1:]
+    avg[window:] -= cs[:-window]
+    avg[window - 1:] /= window
+    return avg
+
+def create_timeline_chart(timeline_data: Any, 
                           title: str = "Traffic Volume Over Time") -> go.Figure:
     """
     Create a line chart showing traffic volume over processed frames.
     
     Args:
-        timeline_data: List of vehicle counts per frame
+        timeline_data: Vehicle counts per frame (list, ndarray or TimelineBuffer)
         title: Chart title
     
     Returns:
         Plotly Figure object
     """
-    fig = go.Figure()
-    
-    if timeline_data:
-        x_values = list(range(1, len(timeline_data) + 1))
+    fig = go.Figure(layout=dict(
+        _TIMELINE_LAYOUT,
+        title=dict(text=f"📈 {title}", font=dict(color='white', size=16), x=0.5)
+    ))
+    
+    values = _timeline_array(timeline_data)
+    if len(values):
+        x_values = np.arange(1, len(values) + 1, dtype=np.int32)
         
         # Main line trace with gradient fill
         fig.add_trace(go.Scatter(
             x=x_values,
-            y=timeline_data,
+            y=values,
             mode='lines+markers',
             name='Vehicles',
             line=dict(color='#00d4ff', width=2.5, shape='spline'),
@@ -394,21 +559,13 @@ def create_timeline_chart(timeline_data: List[int],
         ))
         
         # Add moving average line if enough data
-        if len(timeline_data) >= 5:
-            window = 5
-            moving_avg = []
-            for i in range(len(timeline_data)):
-                if i < window - 1:
-                    moving_avg.append(None)
-                else:
-                    avg = sum(timeline_data[i-window+1:i+1]) / window
-                    moving_avg.append(avg)
-            
+        if len(values) >= MOVING_AVG_WINDOW:
             fig.add_trace(go.Scatter(
                 x=x_values,
-                y=moving_avg,
+                y=_moving_average(values),
                 mode='lines',
                 name='5-Frame Avg',
+                connectgaps=False,
                 line=dict(color='#ff6b6b', width=1.5, dash='dot'),
                 hovertemplate='Avg: %{y:.1f}<extra></extra>'
             ))
@@ -416,43 +573,6 @@ def create_timeline_chart(timeline_data: List[int],
         # Empty placeholder
         fig.add_trace(go.Scatter(x=[0], y=[0], mode='lines'))
     
-    fig.update_layout(
-        title=dict(
-            text=f"📈 {title}",
-            font=dict(color='white', size=16),
-            x=0.5
-        ),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(30,33,48,0.8)',
-        margin=dict(l=60, r=30, t=60, b=50),
-        height=200,
-        xaxis=dict(
-            title="Processed Frame",
-            title_font=dict(color='#8b9dc3', size=12),
-            tickfont=dict(color='#8b9dc3'),
-            gridcolor='rgba(61,68,102,0.3)',
-            showgrid=True,
-            zeroline=False
-        ),
-        yaxis=dict(
-            title="Vehicles Detected",
-            title_font=dict(color='#8b9dc3', size=12),
-            tickfont=dict(color='#8b9dc3'),
-            gridcolor='rgba(61,68,102,0.3)',
-            showgrid=True,
-            zeroline=False
-        ),
-        legend=dict(
-            orientation='h',
-            yanchor='bottom',
-            y=1.02,
-            xanchor='center',
-            x=0.5,
-            font=dict(color='#8b9dc3', size=10)
-        ),
-        hovermode='x unified'
-    )
-    
     return fig
 
 # ============================================================================
@@ -472,7 +592,10 @@ def render_video_placeholder():
 # MAIN LAYOUT COMPONENT
 # ============================================================================
 
-@dataclass
+# dataclass(slots=True) needs Python 3.10; 3.9 (still supported) keeps __dict__
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class DashboardPlaceholders:
     """Container for Streamlit placeholder elements for dynamic updates."""
     video: Any = None
@@ -480,6 +603,10 @@ class DashboardPlaceholders:
     pie_chart: Any = None
     timeline_chart: Any = None
     stat_cards: Any = None
+    pie_fig: Optional[go.Figure] = None       # Figures kept across updates so
+    timeline_fig: Optional[go.Figure] = None  # only their trace data changes
+    last_counts_hash: int = 0                 # Data last drawn, so unchanged
+    last_timeline_hash: int = 0               # charts are not re-sent
 
 def render_main_layout(vehicle_counts: Optional[Dict[str, int]] = None,
                        avg_speed: int = 0) -> DashboardPlaceholders:
@@ -505,7 +632,7 @@ def render_main_layout(vehicle_counts: Optional[Dict[str, int]] = None,
     """
     # Default counts if not provided
     if vehicle_counts is None:
-        vehicle_counts = {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0}
+        vehicle_counts = VehicleCounts()
     
     placeholders = DashboardPlaceholders()
     
@@ -524,8 +651,10 @@ def render_main_layout(vehicle_counts: Optional[Dict[str, int]] = None,
         # Pie chart with placeholder for updates
         st.markdown("<br>", unsafe_allow_html=True)
         placeholders.pie_chart = st.empty()
+        placeholders.pie_fig = create_distribution_chart(vehicle_counts, chart_type="pie")
+        placeholders.last_counts_hash = _counts_key(vehicle_counts)
         placeholders.pie_chart.plotly_chart(
-            create_distribution_chart(vehicle_counts, chart_type="pie"),
+            placeholders.pie_fig,
             use_container_width=True,
             config={'displayModeBar': False}
         )
@@ -545,8 +674,10 @@ def render_main_layout(vehicle_counts: Optional[Dict[str, int]] = None,
     st.markdown("<br>", unsafe_allow_html=True)
     
     placeholders.timeline_chart = st.empty()
+    placeholders.timeline_fig = create_timeline_chart([])
+    placeholders.last_timeline_hash = hash(b"")
     placeholders.timeline_chart.plotly_chart(
-        create_timeline_chart([]),
+        placeholders.timeline_fig,
         use_container_width=True,
         config={'displayModeBar': False}
     )
@@ -555,25 +686,65 @@ def render_main_layout(vehicle_counts: Optional[Dict[str, int]] = None,
 
 def update_charts(placeholders: DashboardPlaceholders,
                   vehicle_counts: Dict[str, int],
-                  timeline_data: List[int]):
+                  timeline_data: Any):
     """
     Update chart placeholders with new data.
     
+    The figures from render_main_layout are patched in place (trace data
+    only) and rebuilt just when their trace layout changes, e.g. when the
+    timeline first gets enough points for its moving average. A chart whose
+    data is unchanged since the last update is not re-sent at all.
+    
     Args:
         placeholders: DashboardPlaceholders object from render_main_layout
         vehicle_counts: Updated vehicle counts
-        timeline_data: Updated timeline data
+        timeline_data: Updated timeline data (list, ndarray or TimelineBuffer)
     """
-    # Update pie chart
+    # Update pie chart (skipped when the counts haven't changed)
+    counts_hash = _counts_key(vehicle_counts)
+    if counts_hash != placeholders.last_counts_hash:
+        placeholders.last_counts_hash = counts_hash
+        _update_pie(placeholders, vehicle_counts)
+    
+    # Update timeline chart
+    values = _timeline_array(timeline_data)
+    timeline_hash = hash(values.tobytes())
+    if timeline_hash != placeholders.last_timeline_hash:
+        placeholders.last_timeline_hash = timeline_hash
+        _update_timeline(placeholders, values)
+
+def _update_pie(placeholders: DashboardPlaceholders, vehicle_counts: Dict[str, int]):
+    """Patch (or rebuild) the pie figure and redraw its placeholder."""
+    pie = placeholders.pie_fig
+    if pie is not None and len(pie.data[0].labels) == len(vehicle_counts):
+        _, values = _counts_arrays(vehicle_counts)
+        pie.data[0].values = values if values.any() else np.ones(len(values), dtype=np.int32)
+    else:
+        pie = placeholders.pie_fig = create_distribution_chart(vehicle_counts, chart_type="pie")
     placeholders.pie_chart.plotly_chart(
-        create_distribution_chart(vehicle_counts, chart_type="pie"),
+        pie,
         use_container_width=True,
         config={'displayModeBar': False}
     )
-    
-    # Update timeline chart
+
+def _update_timeline(placeholders: DashboardPlaceholders, values: np.ndarray):
+    """Patch (or rebuild) the timeline figure and redraw its placeholder."""
+    timeline = placeholders.timeline_fig
+    n_traces = 2 if len(values) >= MOVING_AVG_WINDOW else 1
+    if timeline is not None and len(values) and len(timeline.data) == n_traces \
+            and timeline.data[0].name == 'Vehicles':
+        x_values = np.arange(1, len(values) + 1, dtype=np.int32)
+        timeline.data[0].x = x_values
+        timeline.data[0].y = values
+        if n_traces == 2:
+            timeline.data[1].x = x_values
+            timeline.data[1].y = _moving_average(values)
+    else:
+        timeline = placeholders.timeline_fig = create_timeline_chart(values)
+    # Lets Plotly.react on the client tell new data from an identical re-send
+    timeline.layout.datarevision = placeholders.last_timeline_hash
     placeholders.timeline_chart.plotly_chart(
-        create_timeline_chart(timeline_data),
+        timeline,
         use_container_width=True,
         config={'displayModeBar': False}
     )
@@ -588,7 +759,6 @@ if __name__ == "__main__":
     Usage: streamlit run ui_components.py
     """
     import random
-    import time
     
     # Setup page
     setup_page()
@@ -598,24 +768,29 @@ if __name__ == "__main__":
     render_header()
     
     # Demo data
-    demo_counts = {"car": 45, "motorcycle": 23, "bus": 8, "truck": 12}
-    demo_timeline = [random.randint(0, 5) for _ in range(30)]
+    demo_counts = VehicleCounts(np.array([45, 23, 8, 12], dtype=np.int32))
+    demo_timeline = TimelineBuffer(capacity=50)
+    for _ in range(30):
+        demo_timeline.append(random.randint(0, 5))
     
     # Render layout
     placeholders = render_main_layout(demo_counts, avg_speed=42)
     
-    # Simulate updates button
-    with st.sidebar:
-        st.header("🎮 Demo Controls")
+    # Simulate updates button. A fragment, so a click reruns only this
+    # region instead of the whole script (CSS, header, layout, stat cards)
+    @fragment
+    def demo_controls():
         if st.button("Simulate Detection"):
+            # Simulate 10 frames, then push them to the charts in one update
             for i in range(10):
                 # Increment random vehicle type
-                vehicle_type = random.choice(list(demo_counts.keys()))
-                demo_counts[vehicle_type] += 1
+                demo_counts.increment(random.choice(VEHICLE_TYPES))
                 demo_timeline.append(random.randint(0, 5))
-                
-                # Update charts
-                update_charts(placeholders, demo_counts, demo_timeline[-50:])
-                time.sleep(0.3)
+            
+            update_charts(placeholders, demo_counts, demo_timeline)
             
             st.success("Simulation complete!")
+    
+    with st.sidebar:
+        st.header("🎮 Demo Controls")
+        demo_controls()